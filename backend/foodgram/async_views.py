@@ -0,0 +1,54 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db import database_sync_to_async
+
+
+def _render(view):
+    """
+    Вызывает представление DRF и сразу формирует тело ответа, чтобы
+    Django не отправлял отрисовку в общий поток синхронного кода.
+    """
+    def render(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if not hasattr(response, 'render'):
+            return response
+        response.render()
+        rendered = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            rendered[header] = value
+        rendered.cookies = response.cookies
+        return rendered
+    return render
+
+
+def async_read_view(view):
+    """
+    Асинхронная обёртка синхронного представления.
+
+    Под ASGI Django 3.2 выполняет все синхронные представления процесса
+    в одном потоке по очереди. Запросы на чтение здесь уходят в пул
+    потоков и обрабатываются параллельно, пока цикл событий обслуживает
+    медленных клиентов. Запросы на запись выполняются так же,
+    как Django выполнил бы синхронное представление.
+    """
+    read = database_sync_to_async(_render(view))
+    write = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+    return wrapper
+
+
+def async_read_urls(urlpatterns, names):
+    """Делает асинхронными маршруты urlpatterns с именами из names."""
+    for pattern in urlpatterns:
+        if getattr(pattern, 'name', None) in names:
+            pattern.callback = async_read_view(pattern.callback)
+    return urlpatterns
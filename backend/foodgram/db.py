@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_query_wrappers = ContextVar('query_wrappers', default=())
+
+
+def _execute(execute, sql, params, many, context):
+    for wrapper in reversed(_query_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def _install(connection):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute)
+
+
+@receiver(connection_created)
+def install_query_wrappers(sender, connection, **kwargs):
+    _install(connection)
+
+
+@contextmanager
+def query_wrapper(wrapper):
+    """
+    Аналог connection.execute_wrapper для всех баз, который действует
+    и в потоках, куда sync_to_async уносит запросы к базе: обёртки
+    хранятся в ContextVar, а соединения читают их оттуда.
+    """
+    for connection in connections.all():
+        _install(connection)
+    token = _query_wrappers.set((*_query_wrappers.get(), wrapper))
+    try:
+        yield
+    finally:
+        _query_wrappers.reset(token)
+
+
+def database_sync_to_async(func):
+    """
+    Выполняет синхронный код с ORM в общем пуле потоков.
+
+    В отличие от sync_to_async(thread_sensitive=True), которым Django 3.2
+    под ASGI вызывает синхронные представления, запросы не выстраиваются
+    в очередь к одному потоку. Соединения потоков пула закрываются
+    по CONN_MAX_AGE до и после вызова, как в конце обычного запроса.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+class DerivedFieldsMixin:
+    """
+    Модель с полями derived_fields, которые пишутся только через
+    QuerySet.update(), например счётчики на F() выражениях.
+
+    Обычный save() существующего объекта не записывает эти поля,
+    иначе он вернул бы в базу значения, загруженные вместе с объектом,
+    и затёр бы изменения, сделанные после загрузки.
+    """
+    derived_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if (update_fields is None and not force_insert
+                and not self._state.adding):
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.derived_fields
+            ]
+        super().save(force_insert=force_insert, force_update=force_update,
+                     using=using, update_fields=update_fields)
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from rest_framework.serializers import ListSerializer, Serializer
+
+from foodgram.db import query_wrapper
+
+logger = logging.getLogger('foodgram.instrumentation')
+
+STATS_FIELDS = ('requests', 'queries', 'duplicates', 'total_us', 'db_us',
+                'serializer_us')
+STATS_KEY = 'instrumentation:{view}:{field}'
+STATS_VIEWS_KEY = 'instrumentation:views'
+FLUSH_INTERVAL = 10
+DUPLICATES_WARNING = 5
+SQL_SIGNATURE_LENGTH = 200
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    SQL и время сериализации одного запроса.
+
+    Передаётся в connection.execute_wrapper, поэтому видит все запросы
+    к базе, в том числе из сериализаторов и сигналов.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values()
+                   if count > 1)
+
+    def get_top_duplicate(self):
+        sql, count = self.statements.most_common(1)[0]
+        if count < 2:
+            return None
+        return {'sql': sql[:SQL_SIGNATURE_LENGTH], 'count': count}
+
+    def get_server_timing(self, total_time):
+        return ', '.join((
+            f'total;dur={total_time * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'db-duplicates;desc="{self.duplicates} duplicates"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+        ))
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Засчитывает время блока в сериализацию текущего запроса.
+
+    Вложенные блоки не считаются повторно. Сериализаторы не на DRF
+    оборачивают в него построение data сами, сериализаторы DRF
+    учитываются через install_serializer_timer.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+        metrics.serializing = False
+
+
+def _timed_data(data):
+    def wrapper(serializer):
+        with serializer_timer():
+            return data.fget(serializer)
+    wrapper.instrumented = True
+    return property(wrapper)
+
+
+def install_serializer_timer():
+    for serializer_class in (Serializer, ListSerializer):
+        if not getattr(serializer_class.data.fget, 'instrumented', False):
+            serializer_class.data = _timed_data(serializer_class.data)
+
+
+class ViewStats:
+    """
+    Суммарные показатели по представлениям во всех процессах.
+
+    Процесс копит их в памяти и раз в FLUSH_INTERVAL секунд прибавляет
+    к счётчикам в кэше через incr, чтобы не ходить в кэш на каждый запрос.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(Counter)
+        self._flushed = time.monotonic()
+
+    def add(self, view, metrics, total_time):
+        with self._lock:
+            self._pending[view].update({
+                'requests': 1,
+                'queries': metrics.queries,
+                'duplicates': metrics.duplicates,
+                'total_us': int(total_time * 1_000_000),
+                'db_us': int(metrics.db_time * 1_000_000),
+                'serializer_us': int(metrics.serializer_time * 1_000_000),
+            })
+            if time.monotonic() - self._flushed < FLUSH_INTERVAL:
+                return
+            pending, self._pending = self._pending, defaultdict(Counter)
+            self._flushed = time.monotonic()
+        self._flush(pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+            self._flushed = time.monotonic()
+        self._flush(pending)
+
+    def get_all(self):
+        self.flush()
+        views = cache.get(STATS_VIEWS_KEY, [])
+        keys = [STATS_KEY.format(view=view, field=field)
+                for view in views for field in STATS_FIELDS]
+        values = cache.get_many(keys)
+        stats = []
+        for view in views:
+            row = {field: values.get(STATS_KEY.format(view=view, field=field),
+                                     0)
+                   for field in STATS_FIELDS}
+            requests = row['requests'] or 1
+            stats.append({
+                'view': view,
+                'requests': row['requests'],
+                'queries_avg': round(row['queries'] / requests, 2),
+                'duplicates_avg': round(row['duplicates'] / requests, 2),
+                'total_ms_avg': round(row['total_us'] / requests / 1000, 2),
+                'db_ms_avg': round(row['db_us'] / requests / 1000, 2),
+                'db_ms_total': round(row['db_us'] / 1000, 2),
+                'serializer_ms_avg': round(
+                    row['serializer_us'] / requests / 1000, 2
+                ),
+            })
+        return sorted(stats, key=lambda row: row['db_ms_total'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._pending = defaultdict(Counter)
+        views = cache.get(STATS_VIEWS_KEY, [])
+        cache.delete_many([STATS_KEY.format(view=view, field=field)
+                           for view in views for field in STATS_FIELDS])
+        cache.delete(STATS_VIEWS_KEY)
+
+    @staticmethod
+    def _flush(pending):
+        for view, values in pending.items():
+            for field, value in values.items():
+                key = STATS_KEY.format(view=view, field=field)
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, value)
+        views = cache.get(STATS_VIEWS_KEY, [])
+        new_views = [view for view in pending if view not in views]
+        if new_views:
+            cache.set(STATS_VIEWS_KEY, views + new_views, timeout=None)
+
+
+view_stats = ViewStats()
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Считает SQL-запросы, их время, повторы (признак N+1) и время
+    сериализации для каждого запроса.
+
+    Результат отдаётся в заголовке Server-Timing, пишется в лог строкой
+    JSON и суммируется по представлениям для администраторов. Запросы
+    к базе из потоков sync_to_async тоже учитываются: обёртка передаётся
+    через query_wrapper.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        install_serializer_timer()
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            with query_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            with query_wrapper(metrics):
+                response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    def process_metrics(self, request, response, metrics):
+        total_time = metrics.total_time
+        response['Server-Timing'] = metrics.get_server_timing(total_time)
+        view = self.get_view_name(request)
+        view_stats.add(view, metrics, total_time)
+        self.log(request, response, view, metrics, total_time)
+        return response
+
+    @staticmethod
+    def get_view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match.route
+
+    @staticmethod
+    def log(request, response, view, metrics, total_time):
+        level = (logging.WARNING if metrics.duplicates >= DUPLICATES_WARNING
+                 else logging.INFO)
+        if not logger.isEnabledFor(level):
+            return
+        logger.log(level, json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_time * 1000, 2),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'duplicates': metrics.duplicates,
+            'top_duplicate': metrics.get_top_duplicate()
+            if metrics.queries else None,
+            'serializer_ms': round(metrics.serializer_time * 1000, 2),
+        }, ensure_ascii=False))
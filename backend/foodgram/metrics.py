@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+from foodgram.db import query_wrapper
+
+MULTIPROCESS_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+UNRESOLVED_ROUTE = 'unresolved'
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                 0.25, 0.5, 1.0)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки HTTP-запроса',
+    ('route', 'method')
+)
+RESPONSES = Counter(
+    'foodgram_http_responses_total',
+    'Ответы по коду статуса',
+    ('route', 'method', 'status')
+)
+DB_QUERY_LATENCY = Histogram(
+    'foodgram_db_query_duration_seconds',
+    'Время выполнения SQL-запроса',
+    ('route',),
+    buckets=QUERY_BUCKETS
+)
+PDF_RENDER_LATENCY = Histogram(
+    'foodgram_pdf_render_duration_seconds',
+    'Время формирования PDF списка покупок'
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшу по результату',
+    ('cache', 'result')
+)
+EVENTS = Counter(
+    'foodgram_events_total',
+    'Действия пользователей',
+    ('event',)
+)
+
+
+def count_cache_lookup(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def metrics_view(request):
+    if os.getenv(MULTIPROCESS_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry),
+                        content_type=CONTENT_TYPE_LATEST)
+
+
+class QueryTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations.append(time.perf_counter() - started)
+
+
+class PrometheusMiddleware:
+    """
+    Гистограммы времени ответа и SQL-запросов по маршрутам и счётчики
+    кодов ответа.
+
+    Маршрут берётся из имени URL, а не из пути, чтобы число рядов
+    метрик не зависело от id в адресах.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        with query_wrapper(timer):
+            response = self.get_response(request)
+        self.observe(request, response, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        with query_wrapper(timer):
+            response = await self.get_response(request)
+        self.observe(request, response, timer)
+        return response
+
+    def observe(self, request, response, timer):
+        duration = time.perf_counter() - timer.started
+        route = self.get_route(request)
+        REQUEST_LATENCY.labels(route, request.method).observe(duration)
+        RESPONSES.labels(
+            route, request.method, response.status_code
+        ).inc()
+        query_latency = DB_QUERY_LATENCY.labels(route)
+        for query_duration in timer.durations:
+            query_latency.observe(query_duration)
+
+    @staticmethod
+    def get_route(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return UNRESOLVED_ROUTE
+        return match.view_name or match.route
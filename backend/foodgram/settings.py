@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.PrometheusMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +43,24 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+REQUEST_INSTRUMENTATION = bool(
+    int(os.getenv('REQUEST_INSTRUMENTATION', default=0))
+)
+
+if REQUEST_INSTRUMENTATION:
+    MIDDLEWARE.insert(
+        0, 'foodgram.instrumentation.RequestInstrumentationMiddleware'
+    )
+
+ASYNC_READ_VIEWS = bool(int(os.getenv('ASYNC_READ_VIEWS', default=0)))
+
+# Каталог метрик prometheus_client должен существовать до создания
+# метрик в foodgram.metrics, в том числе для manage.py без gunicorn.
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -85,6 +104,29 @@ else:
         }
     }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    },
+    'tokens': {
+        'BACKEND': os.getenv(
+            'TOKEN_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('TOKEN_CACHE_LOCATION', default='tokens'),
+        'TIMEOUT': int(os.getenv('TOKEN_CACHE_TIMEOUT', default=300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('TOKEN_CACHE_MAX_ENTRIES', default=10000)
+            ),
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -136,7 +178,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS':
@@ -160,3 +202,21 @@ DJOSER = {
 
 USE_X_FORWARDED_HOST = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.instrumentation': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_INSTRUMENTATION_LOG_LEVEL',
+                               default='INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -4,25 +4,45 @@ from django.urls import include, path
 from rest_framework import routers
 
 from foodgram import settings
+from foodgram.async_views import async_read_urls
+from foodgram.metrics import metrics_view
+from foodgram.views import InstrumentationView
 from recipes.views import (DownloadCartView, IngredientViewSet, RecipeViewSet,
                            TagViewSet)
-from users.views import SubscribeView, SubscriptionListView, UserView
+from users.views import (SubscribeBatchView, SubscribeView,
+                         SubscriptionListView, UserView)
 
 router = routers.DefaultRouter()
-router.register(r'recipes', RecipeViewSet)
-router.register(r'ingredients', IngredientViewSet)
-router.register(r'tags', TagViewSet)
-router.register(r'users', UserView)
+router.register(r'recipes', RecipeViewSet, basename='recipes')
+router.register(r'ingredients', IngredientViewSet, basename='ingredients')
+router.register(r'tags', TagViewSet, basename='tags')
+router.register(r'users', UserView, basename='users')
+
+ASYNC_READ_ROUTES = (
+    'recipes-list', 'recipes-detail', 'tags-list', 'tags-detail',
+    'ingredients-list', 'ingredients-detail', 'subscriptions',
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('djoser.urls.authtoken')),
-    path('api/users/subscriptions/', SubscriptionListView.as_view()),
-    path('api/users/<int:pk>/subscribe/', SubscribeView.as_view()),
-    path('api/recipes/download_shopping_cart/', DownloadCartView.as_view()),
+    path('api/instrumentation/', InstrumentationView.as_view()),
+    path('api/users/subscriptions/', SubscriptionListView.as_view(),
+         name='subscriptions'),
+    path('api/users/<int:pk>/subscribe/', SubscribeView.as_view(),
+         name='subscribe'),
+    path('api/users/subscribe/batch/', SubscribeBatchView.as_view(),
+         name='subscribe_batch'),
+    path('api/recipes/download_shopping_cart/', DownloadCartView.as_view(),
+         name='download_shopping_cart'),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include(router.urls))
 ]
 
+if settings.ASYNC_READ_VIEWS:
+    async_read_urls(urlpatterns, ASYNC_READ_ROUTES)
+    async_read_urls(router.urls, ASYNC_READ_ROUTES)
+
 
 if settings.DEBUG:
     urlpatterns += static(
@@ -0,0 +1,16 @@
+from rest_framework import status, views
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from foodgram.instrumentation import view_stats
+
+
+class InstrumentationView(views.APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(view_stats.get_all())
+
+    def delete(self, request):
+        view_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,17 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+MULTIPROCESS_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+
+def on_starting(server):
+    if MULTIPROCESS_DIR:
+        shutil.rmtree(MULTIPROCESS_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROCESS_DIR)
+
+
+def child_exit(server, worker):
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(worker.pid)
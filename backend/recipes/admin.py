@@ -1,8 +1,12 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.db import transaction
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from recipes import grocery
+from recipes.cache import (RECIPE_GENERATION, SEARCH_GENERATION,
+                           invalidate_generations)
+from recipes.models import (Favorite, GroceryItem, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.search import update_search_index
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -13,7 +17,40 @@ class RecipeIngredientInline(admin.TabularInline):
     fields = ('ingredient', 'amount')
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeIngredientsAdminMixin:
+    """
+    После правки ингредиентов рецептов в инлайне обновляет списки
+    покупок, поисковый индекс, дату изменения и кэш ответов этих
+    рецептов: строки инлайна сохраняются без сохранения рецепта.
+
+    get_changed_recipe_ids возвращает id рецептов, чьи строки могут
+    измениться, и вызывается до сохранения инлайнов. По умолчанию таких
+    рецептов нет.
+    """
+
+    def get_changed_recipe_ids(self, form, formsets):
+        return ()
+
+    @transaction.atomic
+    def save_related(self, request, form, formsets, change):
+        old_amounts = {
+            recipe_id: grocery.get_recipe_amounts(recipe_id)
+            for recipe_id in self.get_changed_recipe_ids(form, formsets)
+        }
+        super().save_related(request, form, formsets, change)
+        if not old_amounts:
+            return
+        for recipe_id, amounts in old_amounts.items():
+            grocery.change_recipe(recipe_id, amounts,
+                                  grocery.get_recipe_amounts(recipe_id))
+        update_search_index(list(old_amounts))
+        Recipe.objects.filter(pk__in=old_amounts).touch()
+        invalidate_generations(SEARCH_GENERATION, *(
+            RECIPE_GENERATION.format(pk=pk) for pk in old_amounts
+        ))
+
+
+class RecipeAdmin(RecipeIngredientsAdminMixin, admin.ModelAdmin):
     inlines = [RecipeIngredientInline]
     list_display = ('name', 'author', 'favorite_count')
     list_filter = ('tags', )
@@ -21,29 +58,34 @@ class RecipeAdmin(admin.ModelAdmin):
     filter_horizontal = ('tags',)
     date_hierarchy = 'pub_date'
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(
-            _favorite_count=Count("favorites", distinct=True),
-        )
-        return queryset
-
     @admin.display(description='В избранном')
     def favorite_count(self, obj):
-        count = obj._favorite_count
+        count = obj.favorites_count
         if count == 0:
             return 'нет'
         return f'{count}'
 
-    favorite_count.admin_order_field = '_favorite_count'
+    favorite_count.admin_order_field = 'favorites_count'
+
+    def get_changed_recipe_ids(self, form, formsets):
+        return [form.instance.id]
 
 
-class IngredientsAdmin(admin.ModelAdmin):
+class IngredientsAdmin(RecipeIngredientsAdminMixin, admin.ModelAdmin):
     inlines = [RecipeIngredientInline]
     list_display = ('name', 'measurement_unit')
     list_filter = ('name',)
     search_fields = ('name',)
 
+    def get_changed_recipe_ids(self, form, formsets):
+        return {
+            inline_form.instance.recipe_id
+            for formset in formsets for inline_form in formset.forms
+            if inline_form.instance.recipe_id is not None
+            and (inline_form.has_changed()
+                 or inline_form in formset.deleted_forms)
+        }
+
 
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
@@ -57,8 +99,16 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_filter = ('user', 'recipe')
 
 
+class GroceryItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_display_links = ('user',)
+    list_filter = ('user',)
+    readonly_fields = ('user', 'ingredient', 'amount')
+
+
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Ingredient, IngredientsAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
+admin.site.register(GroceryItem, GroceryItemAdmin)
 admin.site.register(Tag)
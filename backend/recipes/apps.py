@@ -5,3 +5,8 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Список рецептов'
+
+    def ready(self):
+        import recipes.signals  # noqa: F401
+        from recipes.pdf import register_fonts
+        register_fonts()
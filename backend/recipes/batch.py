@@ -0,0 +1,122 @@
+from django.db import transaction
+
+from foodgram.metrics import EVENTS
+from recipes import grocery
+from recipes.cache import POPULARITY_GENERATION, invalidate_generations
+from recipes.constants import Messages
+from recipes.counters import COUNTERS
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.relations import UserRelations
+from recipes.signals import EVENT_NAMES
+from users.models import Subscription, User
+
+CREATED = 'created'
+DELETED = 'deleted'
+EXISTS = 'exists'
+NOT_EXISTING = 'not_existing'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+ERRORS = {
+    EXISTS: Messages.ALREADY_EXISTING_ERROR,
+    NOT_EXISTING: Messages.NOT_EXISTING_ERROR,
+    NOT_FOUND: Messages.NOT_FOUND_ERROR,
+    SELF: Messages.SUBSCRIBE_BY_YOURSELF_ERROR,
+}
+
+
+class BatchRelation:
+    """
+    Добавление и удаление связей пользователя со списком объектов
+    в одной транзакции: одна вставка bulk_create(ignore_conflicts=True)
+    и одно удаление вместо запроса на каждый объект.
+
+    bulk_create и _raw_delete не вызывают сигналы, поэтому счётчики
+    затронутых объектов пересчитываются, список покупок пользователя
+    собирается заново, а его связи и зависящие от счётчиков ответы
+    удаляются из кэша. Пересчёт, а не прибавление, даёт верный
+    результат, даже если те же строки параллельно добавил другой запрос
+    и ignore_conflicts их пропустил.
+    """
+
+    def __init__(self, model, field, target_model):
+        self.model = model
+        self.field = field
+        self.target_model = target_model
+        self.counters = [counter for counter in COUNTERS
+                         if counter.related_model is model]
+
+    def get_statuses(self, user, ids):
+        ids = list(dict.fromkeys(ids))
+        found = set(self.target_model.objects.filter(
+            id__in=ids
+        ).values_list('id', flat=True))
+        linked = set(self.get_records(user, ids).values_list(
+            f'{self.field}_id', flat=True
+        ))
+        return {
+            pk: (NOT_FOUND if pk not in found
+                 else EXISTS if pk in linked
+                 else SELF if self.model is Subscription and pk == user.id
+                 else None)
+            for pk in ids
+        }
+
+    def get_records(self, user, ids):
+        return self.model.objects.filter(
+            user=user, **{f'{self.field}__in': ids}
+        )
+
+    @transaction.atomic
+    def add(self, user, ids):
+        statuses = self.get_statuses(user, ids)
+        created = [pk for pk, status in statuses.items() if status is None]
+        self.model.objects.bulk_create(
+            [self.model(user=user, **{f'{self.field}_id': pk})
+             for pk in created],
+            ignore_conflicts=True
+        )
+        if created:
+            self.update_derived(user, created)
+            EVENTS.labels(EVENT_NAMES[self.model]).inc(len(created))
+        return self.get_results(statuses, CREATED)
+
+    @transaction.atomic
+    def remove(self, user, ids):
+        statuses = {
+            pk: None if status == EXISTS
+            else NOT_EXISTING if status in (None, SELF)
+            else status
+            for pk, status in self.get_statuses(user, ids).items()
+        }
+        deleted = [pk for pk, status in statuses.items() if status is None]
+        if deleted:
+            records = self.get_records(user, deleted)
+            records._raw_delete(records.db)
+            self.update_derived(user, deleted)
+        return self.get_results(statuses, DELETED)
+
+    def update_derived(self, user, ids):
+        for counter in self.counters:
+            counter.recount(ids)
+        if self.model is ShoppingCart:
+            grocery.rebuild([user.id])
+        if self.model is not Subscription:
+            invalidate_generations(POPULARITY_GENERATION)
+        UserRelations.invalidate(user.id)
+
+    @staticmethod
+    def get_results(statuses, success):
+        results = []
+        for pk, status in statuses.items():
+            if status is None:
+                results.append({'id': pk, 'status': success})
+            else:
+                results.append({'id': pk, 'status': status,
+                                'error': ERRORS[status]})
+        return results
+
+
+favorites = BatchRelation(Favorite, 'recipe', Recipe)
+shopping_cart = BatchRelation(ShoppingCart, 'recipe', Recipe)
+subscriptions = BatchRelation(Subscription, 'subscription', User)
@@ -0,0 +1,399 @@
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import quote, urlsplit
+from urllib.request import Request, urlopen
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from recipes.constants import BenchmarkSettings, DatasetSettings
+from recipes.dataset import DatasetGenerator, DatasetSize
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.serializer import RecipeReadSerializer, RecipeSerializer
+
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+class Scenario:
+    """
+    Запрос из коллекции Postman с весом, равным числу его повторов в ней.
+
+    Для POST на избранное, корзину и подписку сразу выполняется парный
+    DELETE, чтобы прогон не накапливал состояние.
+    """
+
+    def __init__(self, method, path, anonymous, cleanup=None):
+        self.method = method
+        self.path = path
+        self.anonymous = anonymous
+        self.cleanup = cleanup
+        self.weight = 0
+
+    @property
+    def name(self):
+        return f'{self.method} {self.path}'
+
+    def get_requests(self, dataset, rng):
+        actor = None if self.anonymous else rng.choice(dataset.user_ids)
+        values = {}
+        path = dataset.resolve(self.path, rng, actor, values)
+        requests = [(self.name, self.method, path, actor)]
+        if self.cleanup:
+            requests.append((
+                f'DELETE {self.cleanup}', 'DELETE',
+                dataset.resolve(self.cleanup, rng, actor, values), actor
+            ))
+        return requests
+
+
+def _walk(items, folders=()):
+    for item in items:
+        if 'item' in item:
+            yield from _walk(item['item'], (*folders, item['name']))
+        else:
+            yield folders, item
+
+
+def _get_path(request):
+    url = request['url']
+    raw = url['raw'] if isinstance(url, dict) else url
+    return raw.replace('{{baseUrl}}', '')
+
+
+def load_scenarios(collection_path, writes=False):
+    with open(collection_path, encoding='utf-8') as file:
+        collection = json.load(file)
+    items = [
+        (item['name'], item['request'])
+        for folders, item in _walk(collection['item'])
+        if not any(skipped in folder
+                   for folder in folders
+                   for skipped in BenchmarkSettings.SKIPPED_FOLDERS)
+    ]
+    deletes = {_get_path(request) for _, request in items
+               if request['method'] == 'DELETE'}
+    scenarios = {}
+    for name, request in items:
+        method, path = request['method'], _get_path(request)
+        cleanup = None
+        if method == 'POST':
+            cleanup = path.split('?')[0]
+            action = cleanup.rstrip('/').rsplit('/', 1)[-1]
+            if (not writes or cleanup not in deletes
+                    or action not in BenchmarkSettings.TOGGLE_ACTIONS):
+                continue
+        elif method != 'GET':
+            continue
+        anonymous = BenchmarkSettings.ANONYMOUS_MARK in name
+        key = (method, path, anonymous)
+        if key not in scenarios:
+            scenarios[key] = Scenario(method, path, anonymous, cleanup)
+        scenarios[key].weight += 1
+    return list(scenarios.values())
+
+
+class Dataset:
+    """
+    Синтетические данные для прогона: пользователи с токенами, теги,
+    ингредиенты и рецепты, из которых подставляются переменные коллекции.
+    """
+
+    def __init__(self):
+        prefix = DatasetSettings.USERNAME_PREFIX
+        self.tokens = dict(Token.objects.filter(
+            user__username__startswith=prefix
+        ).values_list('user_id', 'key'))
+        self.user_ids = sorted(self.tokens)
+        self.recipe_ids = list(Recipe.objects.filter(
+            author__username__startswith=prefix
+        ).values_list('id', flat=True))
+        self.tags = list(Tag.objects.values_list('id', 'slug'))
+        self.ingredients = list(Ingredient.objects.values_list('id', 'name'))
+
+    def __bool__(self):
+        return bool(self.user_ids and self.recipe_ids)
+
+    def get_value(self, name, rng, actor):
+        name = name.lower()
+        if name.endswith('userid'):
+            return rng.choice([pk for pk in self.user_ids if pk != actor])
+        if name.endswith('recipeid'):
+            return rng.choice(self.recipe_ids)
+        if name.endswith('tagid'):
+            return rng.choice(self.tags)[0]
+        if name.endswith('tagslug'):
+            return rng.choice(self.tags)[1]
+        if name.endswith('dientid'):
+            return rng.choice(self.ingredients)[0]
+        if name.startswith('ingredientname'):
+            return rng.choice(self.ingredients)[1][0]
+        raise ValueError(f'Неизвестная переменная коллекции: {name}')
+
+    def resolve(self, path, rng, actor, values):
+        def replace(match):
+            name = match.group(1)
+            if name not in values:
+                values[name] = self.get_value(name, rng, actor)
+            return str(values[name])
+        return VARIABLE.sub(replace, path)
+
+
+@transaction.atomic
+def seed_dataset(scale, seed):
+    """
+    Создаёт данные для прогона генератором из recipes.dataset,
+    если их ещё нет в базе.
+    """
+    dataset = Dataset()
+    if dataset:
+        return dataset
+    size = DatasetSize(scale * BenchmarkSettings.SCALE)
+    DatasetGenerator(size, seed).generate()
+    return Dataset()
+
+
+class ClientTarget:
+    """
+    Запросы через тестовый клиент Django в этом же процессе.
+    """
+    concurrent = False
+
+    def __init__(self, tokens):
+        self.client = Client()
+        self.tokens = tokens
+
+    def __call__(self, method, path, actor):
+        headers = {}
+        if actor is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Token {self.tokens[actor]}'
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = self.client.generic(method, path, **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        sql_time = sum(float(query['time'])
+                       for query in context.captured_queries)
+        return response.status_code, elapsed, len(context), sql_time
+
+
+class LiveTarget:
+    """
+    Запросы по HTTP к запущенному серверу, например gunicorn.
+
+    Число и время SQL-запросов в этом режиме недоступны.
+    """
+    concurrent = True
+
+    def __init__(self, base_url, tokens):
+        self.base_url = base_url.rstrip('/')
+        self.tokens = tokens
+
+    def __call__(self, method, path, actor):
+        url = self.base_url + quote(path, safe='/?=&')
+        request = Request(url, method=method)
+        if actor is not None:
+            request.add_header('Authorization', f'Token {self.tokens[actor]}')
+        started = time.perf_counter()
+        try:
+            with urlopen(request) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            error.read()
+            status = error.code
+        return status, time.perf_counter() - started, None, None
+
+
+class SlowClients:
+    """
+    Медленные клиенты на время прогона: каждый в своём потоке
+    по кругу отправляет запрос, передавая заголовки по одному
+    с паузой. Синхронный воркер занят таким клиентом целиком,
+    асинхронный сервер обслуживает остальных, пока ждёт данные.
+    """
+
+    def __init__(self, base_url, count, path=BenchmarkSettings.SLOW_PATH):
+        url = urlsplit(base_url)
+        self.address = (url.hostname, url.port or 80)
+        self.lines = [f'GET {path} HTTP/1.1', f'Host: {url.netloc}',
+                      *BenchmarkSettings.SLOW_HEADERS, 'Connection: close',
+                      '']
+        self.count = count
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def __enter__(self):
+        for _ in range(self.count):
+            thread = threading.Thread(target=self.run, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def __exit__(self, *args):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                with socket.create_connection(self.address) as client:
+                    for line in self.lines:
+                        if self.stopped.wait(BenchmarkSettings.SLOW_DELAY):
+                            return
+                        client.sendall(f'{line}\r\n'.encode())
+                    while client.recv(65536):
+                        pass
+            except OSError:
+                self.stopped.wait(BenchmarkSettings.SLOW_DELAY)
+
+
+def build_plan(scenarios, dataset, count, seed):
+    rng = random.Random(seed)
+    weights = [scenario.weight for scenario in scenarios]
+    return [scenario.get_requests(dataset, rng)
+            for scenario in rng.choices(scenarios, weights, k=count)]
+
+
+def run_plan(plan, target, concurrency=1):
+    def run_job(job):
+        return [(name, target(method, path, actor))
+                for name, method, path, actor in job]
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(run_job, plan))
+    else:
+        results = [run_job(job) for job in plan]
+    wall_time = time.perf_counter() - started
+    samples = defaultdict(list)
+    for job_results in results:
+        for name, sample in job_results:
+            samples[name].append(sample)
+    return samples, wall_time
+
+
+def _percentile(values, percent):
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _milliseconds(value):
+    return None if value is None else round(value * 1000, 3)
+
+
+def summarize(samples, wall_time):
+    endpoints = {}
+    for name, endpoint_samples in sorted(samples.items()):
+        statuses = defaultdict(int)
+        for status, *_ in endpoint_samples:
+            statuses[status] += 1
+        latencies = sorted(sample[1] for sample in endpoint_samples)
+        queries = _mean([sample[2] for sample in endpoint_samples])
+        endpoints[name] = {
+            'requests': len(endpoint_samples),
+            'throughput': round(len(endpoint_samples) / wall_time, 2),
+            **{f'p{percent}_ms': _milliseconds(_percentile(latencies,
+                                                           percent))
+               for percent in BenchmarkSettings.PERCENTILES},
+            'mean_ms': _milliseconds(_mean(latencies)),
+            'queries': None if queries is None else round(queries, 2),
+            'sql_ms': _milliseconds(
+                _mean([sample[3] for sample in endpoint_samples])
+            ),
+            'errors': sum(count for status, count in statuses.items()
+                          if status >= 500),
+            'statuses': {str(status): count
+                         for status, count in sorted(statuses.items())},
+        }
+    total = sum(endpoint['requests'] for endpoint in endpoints.values())
+    return {
+        'requests': total,
+        'wall_time_s': round(wall_time, 3),
+        'throughput': round(total / wall_time, 2),
+        'endpoints': endpoints,
+    }
+
+
+def compare(report, baseline, threshold):
+    regressions = []
+    for name, endpoint in report['endpoints'].items():
+        previous = baseline['endpoints'].get(name)
+        if previous is None:
+            continue
+        for metric in ('p95_ms', 'queries'):
+            old, new = previous.get(metric), endpoint.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == 'queries':
+                limit = old + BenchmarkSettings.QUERIES_TOLERANCE
+            else:
+                limit = old * (1 + threshold)
+            if new > limit:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def measure_serializers(limit, repeat, user=None):
+    """
+    Стоимость одного рецепта в RecipeSerializer и RecipeReadSerializer
+    на первых limit рецептах, с запросами к базе и без времени SQL.
+
+    Возвращает отчёт и признак того, что оба дали одинаковый JSON.
+    """
+    request = RequestFactory().get('/api/recipes/')
+    request.user = user or AnonymousUser()
+    loaders = {
+        'RecipeSerializer': (
+            RecipeSerializer,
+            lambda: list(Recipe.objects.with_related()[:limit])
+        ),
+        'RecipeReadSerializer': (
+            RecipeReadSerializer,
+            lambda: list(Recipe.objects.values(
+                *RecipeReadSerializer.FIELDS
+            )[:limit])
+        ),
+    }
+    report, bodies = {}, set()
+    for name, (serializer_class, load) in loaders.items():
+        elapsed = sql_time = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                serializer = serializer_class(
+                    load(), many=True, context={'request': request}
+                )
+                body = JSONRenderer().render(serializer.data)
+                elapsed += time.perf_counter() - started
+            sql_time += sum(float(query['time'])
+                            for query in context.captured_queries)
+        bodies.add(body)
+        items = len(serializer.data) * repeat or 1
+        report[name] = {
+            'items': len(serializer.data),
+            'queries': len(context),
+            'per_item_us': round(elapsed / items * 1e6, 1),
+            'python_per_item_us': round(
+                (elapsed - sql_time) / items * 1e6, 1
+            ),
+        }
+    return report, len(bodies) == 1
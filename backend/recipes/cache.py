@@ -0,0 +1,279 @@
+import time
+from hashlib import sha1
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.metrics import count_cache_lookup
+
+CATALOG_VERSION_KEY = 'catalog:{name}:version'
+CATALOG_BODY_KEY = 'catalog:{name}:{version}'
+CATALOG_TIMEOUT = 5 * 60
+GENERATION_KEY = 'generation:{name}'
+RESPONSE_KEY = 'response:{name}:{digest}'
+RESPONSE_TIMEOUT = 10 * 60
+
+RECIPES_GENERATION = 'recipes'
+SEARCH_GENERATION = 'recipes_search'
+POPULARITY_GENERATION = 'recipes_popularity'
+RECIPE_GENERATION = 'recipe:{pk}'
+USER_GENERATION = 'user:{pk}'
+
+
+class CatalogCache:
+    """
+    Сериализованный справочник целиком в кэше под номером версии.
+
+    Версия — время её создания. При любом изменении модели сигналы
+    удаляют её после коммита, и следующий запрос начинает новую, поэтому
+    старые ключи просто перестают читаться и вытесняются кэшем сами.
+    Версия и тела живут CATALOG_TIMEOUT: с кэшем в памяти процесса
+    изменение видит только обработавший его воркер, а остальные
+    подхватывают его не позже, чем через это время.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def version_key(self):
+        return CATALOG_VERSION_KEY.format(name=self.name)
+
+    def get_version(self):
+        return cache.get_or_set(self.version_key, time.time_ns,
+                                timeout=CATALOG_TIMEOUT)
+
+    def bump_version(self):
+        key = self.version_key
+        transaction.on_commit(lambda: cache.delete(key))
+
+    def get_etag(self, version=None):
+        return quote_etag(f'{self.name}-{version or self.get_version()}')
+
+    def get_body(self, version, render):
+        key = CATALOG_BODY_KEY.format(name=self.name, version=version)
+        body = cache.get(key)
+        count_cache_lookup(f'catalog_{self.name}', body is not None)
+        if body is None:
+            body = render()
+            cache.set(key, body, timeout=CATALOG_TIMEOUT)
+        return body
+
+
+tag_catalog = CatalogCache('tags')
+ingredient_catalog = CatalogCache('ingredients')
+
+
+class CatalogCacheMixin:
+    """
+    Ответы на GET списка из кэша с ETag и 304 на If-None-Match.
+    """
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        version = self.catalog.get_version()
+        etag = self.catalog.get_etag(version)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = self.get_list_response(request, version, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def get_list_response(self, request, version, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        return HttpResponse(
+            self.catalog.get_body(version, self.render_catalog),
+            content_type='application/json'
+        )
+
+    def render_catalog(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return JSONRenderer().render(serializer.data)
+
+
+def get_generation_key(name):
+    return GENERATION_KEY.format(name=name)
+
+
+def get_generations(keys):
+    """
+    Текущие поколения по ключам. Отсутствующее поколение создаётся
+    со значением из текущего времени, чтобы не совпасть с записями,
+    сохранёнными до его сброса или вытеснения.
+    """
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        generations.update(cache.get_many(missing))
+    return generations
+
+
+def invalidate_generations(*names):
+    """Сбрасывает поколения names после коммита транзакции."""
+    keys = [get_generation_key(name) for name in names]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_recipes(recipe_ids=()):
+    """
+    Сбрасывает все списки рецептов и рецепты recipe_ids. Для массовых
+    изменений, которые не вызывают сигналы.
+    """
+    invalidate_generations(
+        RECIPES_GENERATION, SEARCH_GENERATION, POPULARITY_GENERATION,
+        *(RECIPE_GENERATION.format(pk=pk) for pk in recipe_ids)
+    )
+
+
+class ResponseCache:
+    """
+    Тела ответов вместе с поколениями всего, из чего они собраны.
+
+    Изменение данных сбрасывает только свои поколения, например одного
+    рецепта или автора, поэтому при чтении устаревают лишь записи,
+    которые от них зависели, а не весь кэш.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_key(self, request):
+        query = urlencode(sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        ), doseq=True)
+        url = f'{request.build_absolute_uri(request.path)}?{query}'
+        return RESPONSE_KEY.format(
+            name=self.name, digest=sha1(url.encode()).hexdigest()
+        )
+
+    def get(self, key):
+        entry = cache.get(key)
+        hit = entry is not None and get_generations(
+            list(entry['generations'])
+        ) == entry['generations']
+        count_cache_lookup(f'response_{self.name}', hit)
+        return entry if hit else None
+
+    def set(self, key, response, generations):
+        cache.set(key, {
+            'generations': generations,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+        }, RESPONSE_TIMEOUT)
+
+
+recipe_responses = ResponseCache('recipes')
+
+
+class ResponseCacheMixin:
+    """
+    Анонимные GET списка и объекта в формате JSON из кэша ответов.
+
+    get_dependencies возвращает ключи поколений, известные до запроса,
+    get_data_dependencies — ключи для объектов, попавших в ответ.
+    Первые читаются до представления, вторые известны только после него,
+    поэтому ответ не сохраняется, если какое-то из них создано уже после
+    начала запроса: сброс мог прийти между чтением из базы и чтением
+    поколения.
+    """
+    response_cache = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, view, request, *args, **kwargs):
+        if (not request.user.is_anonymous
+                or request.accepted_renderer.format != 'json'):
+            return view(request, *args, **kwargs)
+        key = self.response_cache.get_key(request)
+        entry = self.response_cache.get(key)
+        if entry is not None:
+            return HttpResponse(entry['content'],
+                                content_type=entry['content_type'])
+        generations = get_generations(self.get_dependencies(request))
+        started = time.time_ns()
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            data_generations = get_generations(
+                self.get_data_dependencies(response.data)
+            )
+            if all(generation < started
+                   for generation in data_generations.values()):
+                generations.update(data_generations)
+                self.response_cache.set(key, response, generations)
+        return response
+
+    def get_dependencies(self, request):
+        return []
+
+    def get_data_dependencies(self, data):
+        return []
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для GET списка и объекта. На If-None-Match
+    и If-Modified-Since отвечает 304 до сериализации и кэша ответов.
+
+    get_list_validators и get_object_validators возвращают пару
+    (etag, last_modified), где last_modified — метка времени или None.
+    По умолчанию валидаторов нет и запрос обрабатывается как обычно.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.get_list_validators(request),
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.get_object_validators(request, *args, **kwargs),
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional_response(self, validators, view, request, *args,
+                                 **kwargs):
+        etag, last_modified = validators
+        if etag is None and last_modified is None:
+            return view(request, *args, **kwargs)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            if etag is not None:
+                response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_list_validators(self, request):
+        return None, None
+
+    def get_object_validators(self, request, *args, **kwargs):
+        return None, None
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 
 class Limits:
     MAX_STANDARD_FIELD_LENGTH = 200
@@ -13,6 +15,37 @@ class Messages:
     NOT_UNIQUE_ERROR = 'Значения должны быть уникальными'
     NOT_EXISTING_ERROR = 'Нельзя удалить несуществующую запись'
     SUBSCRIBE_BY_YOURSELF_ERROR = 'Вы не можете быть подписаны на себя'
+    IMAGE_TOO_LARGE_ERROR = 'Размер изображения не должен превышать {size} Мб'
+    IMAGE_DIMENSIONS_ERROR = (
+        'Стороны изображения должны быть от {min_side} до {max_side} пикселей'
+    )
+    IMAGE_PIXELS_ERROR = (
+        'Изображение не должно превышать {megapixels} мегапикселей'
+    )
+    INVALID_IMAGE_ERROR = 'Загрузите корректное изображение'
+    CURSOR_ORDERING_ERROR = (
+        'Не сочетается с курсорной пагинацией: она упорядочивает '
+        'по дате публикации'
+    )
+    NOT_FOUND_ERROR = 'Объект не найден'
+
+
+class ImageSettings:
+    MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+    MIN_SIDE = 50
+    MAX_SIDE = 10000
+    MAX_PIXELS = 25 * 1000 * 1000
+    CANONICAL_SIZE = (1280, 1280)
+    THUMBNAIL_SIZE = (400, 400)
+    JPEG_QUALITY = 85
+    WEBP_QUALITY = 80
+    VARIANTS_DIR = 'recipes/images/variants/'
+    VARIANTS = {
+        'thumbnail': ('_thumb', 'jpg'),
+        'webp': ('', 'webp'),
+        'thumbnail_webp': ('_thumb', 'webp'),
+    }
+    WORKERS = 2
 
 
 class PdfSettings:
@@ -26,4 +59,80 @@ class PdfSettings:
     INGREDIENT_X = 70
     AMOUNT_X = 450
     ROW_START_Y = 760
+    NEXT_PAGE_ROW_START_Y = 800
+    ROW_END_Y = 50
     ROW_SHIFT_Y = 25
+    CACHE_PREFIX = 'grocery_pdf'
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class ExportSettings:
+    FORMAT_PARAM = 'format'
+    FILE_NAME = 'groceries.{format}'
+    CONTENT_TYPES = {
+        'csv': 'text/csv; charset=utf-8',
+        'txt': 'text/plain; charset=utf-8',
+        'json': 'application/json',
+    }
+    CSV_HEADER = ('name', 'measurement_unit', 'amount')
+
+
+class BatchSettings:
+    MAX_SIZE = 100
+
+
+class ImportSettings:
+    CHUNK_SIZE = 5000
+    ROW_ERROR = 'строка {number}: {reason}'
+    MISSING_VALUE_ERROR = 'нет значения в колонке {column}'
+    INVALID_VALUE_ERROR = 'некорректное значение: {error}'
+    UNKNOWN_AUTHOR_ERROR = 'автор не найден'
+    NO_TAGS_ERROR = 'не указаны теги'
+    UNKNOWN_TAG_ERROR = 'неизвестный тег {tag}'
+    NO_INGREDIENTS_ERROR = 'не указаны ингредиенты'
+    UNKNOWN_INGREDIENT_ERROR = 'неизвестный ингредиент {ingredient}'
+    USERNAME_TAKEN_ERROR = 'имя пользователя {username} занято'
+
+
+class DatasetSettings:
+    USERNAME_PREFIX = 'bench_'
+    USERS_PER_SCALE = 1000
+    RECIPES_PER_SCALE = 10000
+    FAVORITES_PER_SCALE = 100000
+    CARTS_PER_SCALE = 10000
+    SUBSCRIPTIONS_PER_SCALE = 20000
+    ZIPF_EXPONENT = 1.1
+    INGREDIENTS = 2000
+    INGREDIENTS_PER_RECIPE = (3, 12)
+    TAGS_PER_RECIPE = (1, 3)
+    TAGS = (
+        ('Завтрак', 'breakfast', '#E26C2D'),
+        ('Обед', 'lunch', '#49B64E'),
+        ('Ужин', 'dinner', '#8775D2'),
+        ('Десерт', 'dessert', '#F39C12'),
+        ('Закуска', 'snack', '#3498DB'),
+    )
+    RECIPE_WORDS = (
+        'суп', 'салат', 'пирог', 'рагу', 'запеканка', 'паста', 'каша',
+        'курица', 'говядина', 'рыба', 'грибы', 'сыр', 'томаты', 'картофель',
+        'тыква', 'шпинат', 'ягоды', 'яблоки', 'орехи', 'имбирь', 'чеснок',
+        'домашний', 'быстрый', 'пряный', 'сливочный', 'печёный', 'лёгкий',
+        'острый', 'летний', 'зимний', 'праздничный', 'овощной', 'сытный',
+    )
+    PUBLICATION_PERIOD = timedelta(days=365)
+    IMAGE = 'recipes/images/benchmark.jpg'
+    BATCH_SIZE = 10000
+
+
+class BenchmarkSettings:
+    COLLECTION_PATH = '../postman-collection/diploma.postman_collection.json'
+    SKIPPED_FOLDERS = ('register_and_get_tokens', 'bad_requests')
+    ANONYMOUS_MARK = '// No Auth'
+    TOGGLE_ACTIONS = ('favorite', 'shopping_cart', 'subscribe')
+    SCALE = 0.02
+    SLOW_PATH = '/api/tags/'
+    SLOW_HEADERS = ('Accept: application/json', 'Accept-Language: ru',
+                    'User-Agent: foodgram-benchmark')
+    SLOW_DELAY = 0.5
+    PERCENTILES = (50, 95, 99)
+    QUERIES_TOLERANCE = 0.5
@@ -0,0 +1,61 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+class Counter:
+    """
+    Счётчик model.field, равный числу строк related_model,
+    ссылающихся на объект через внешний ключ fk_name.
+    """
+
+    def __init__(self, model, field, related_model, fk_name):
+        self.model = model
+        self.field = field
+        self.related_model = related_model
+        self.fk_name = fk_name
+
+    def __str__(self):
+        return f'{self.model._meta.label}.{self.field}'
+
+    def add(self, pk, delta):
+        self.model.objects.filter(pk=pk).update(
+            **{self.field: F(self.field) + delta}
+        )
+
+    def on_related_saved(self, sender, instance, created, **kwargs):
+        if created:
+            self.add(getattr(instance, f'{self.fk_name}_id'), 1)
+
+    def on_related_deleted(self, sender, instance, **kwargs):
+        self.add(getattr(instance, f'{self.fk_name}_id'), -1)
+
+    def expected(self):
+        return Coalesce(Subquery(
+            self.related_model.objects.filter(
+                **{self.fk_name: OuterRef('pk')}
+            ).order_by().values(self.fk_name).annotate(
+                count=Count('pk')
+            ).values('count')
+        ), 0)
+
+    def count_drift(self):
+        return self.model.objects.annotate(
+            expected_count=self.expected()
+        ).exclude(**{self.field: F('expected_count')}).count()
+
+    def recount(self, pks=None):
+        queryset = self.model.objects.all()
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+        return queryset.update(**{self.field: self.expected()})
+
+
+COUNTERS = (
+    Counter(Recipe, 'favorites_count', Favorite, 'recipe'),
+    Counter(Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    Counter(User, 'recipes_count', Recipe, 'author'),
+    Counter(User, 'subscribers_count', Subscription, 'subscription'),
+)
@@ -0,0 +1,342 @@
+import csv
+import io
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes import grocery
+from recipes.cache import ingredient_catalog, invalidate_recipes, tag_catalog
+from recipes.constants import DatasetSettings
+from recipes.counters import COUNTERS
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, GroceryItem, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.search import update_search_index
+from users.models import Subscription, User
+
+
+class DatasetSize:
+    """
+    Объём генерируемых данных; scale умножает базовые размеры
+    из DatasetSettings, отдельные значения можно переопределить.
+    """
+    FIELDS = ('users', 'recipes', 'favorites', 'carts', 'subscriptions')
+
+    def __init__(self, scale=1, **sizes):
+        for field in self.FIELDS:
+            size = sizes.get(field)
+            if size is None:
+                size = getattr(DatasetSettings, f'{field.upper()}_PER_SCALE')
+                size = int(size * scale)
+            setattr(self, field, size)
+
+    def __str__(self):
+        return ', '.join(f'{field}={getattr(self, field)}'
+                         for field in self.FIELDS)
+
+
+class ZipfSampler:
+    """
+    Выборка с распределением Ципфа: вес k-го по популярности элемента
+    пропорционален 1 / k^exponent. Порядок популярности случайный,
+    чтобы популярность не совпадала с порядком id.
+    """
+
+    def __init__(self, items, rng, exponent=DatasetSettings.ZIPF_EXPONENT):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.rng = rng
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+
+    def __len__(self):
+        return len(self.items)
+
+    def choices(self, k):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights,
+                                k=k)
+
+    def sample(self, k, exclude=None):
+        k = min(k, len(self.items) - (exclude is not None))
+        if k > len(self.items) // 2:
+            chosen = self.rng.sample(self.items, min(k + 1, len(self.items)))
+            return [item for item in chosen if item != exclude][:k]
+        chosen = set()
+        while len(chosen) < k:
+            chosen.update(self.choices(k - len(chosen)))
+            chosen.discard(exclude)
+        return list(chosen)[:k]
+
+    def distribute(self, total, limit):
+        """
+        Раскладывает total событий по элементам, не больше limit на каждый;
+        излишек у заполненных элементов достаётся остальным, а когда
+        их большинство, остаток раздаётся незаполненным поровну.
+        """
+        counts = Counter()
+        total = min(total, limit * len(self.items))
+        while total > 0:
+            batch = min(total, DatasetSettings.BATCH_SIZE * 10)
+            counts.update(self.choices(batch))
+            overflow = sum(count - limit for count in counts.values()
+                           if count > limit)
+            for item in counts:
+                counts[item] = min(counts[item], limit)
+            total -= batch - overflow
+            if overflow > batch // 2:
+                break
+        free = [item for item in self.items if counts[item] < limit]
+        while total > 0:
+            item = self.rng.choice(free)
+            counts[item] += 1
+            total -= 1
+            if counts[item] == limit:
+                free.remove(item)
+        return counts
+
+
+class BulkWriter:
+    """
+    Пакетная запись строк в таблицу модели в обход ORM.
+
+    В PostgreSQL пакет уходит одной командой COPY, в остальных базах
+    через executemany. Незаданные поля берут значение по умолчанию
+    из модели, так как в самой таблице умолчаний нет.
+    """
+
+    def __init__(self, model, batch_size=DatasetSettings.BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self.fields = [field for field in model._meta.concrete_fields
+                       if field is not model._meta.auto_field]
+        self.defaults = {field.attname: field.get_default()
+                         for field in self.fields}
+        self.rows = []
+        self.written = 0
+
+    def add(self, **values):
+        self.rows.append([
+            field.get_db_prep_save(
+                values.get(field.attname, self.defaults[field.attname]),
+                connection
+            )
+            for field in self.fields
+        ])
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        columns = ', '.join(quote(field.column) for field in self.fields)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(self.rows)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN WITH CSV', buffer
+                )
+            else:
+                placeholders = ', '.join(['%s'] * len(self.fields))
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})',
+                    self.rows
+                )
+        self.written += len(self.rows)
+        self.rows = []
+
+
+class DatasetGenerator:
+    """
+    Детерминированный по seed набор данных: пользователи с токенами,
+    рецепты с тегами и ингредиентами, избранное, корзины и подписки.
+
+    Популярность рецептов, ингредиентов и авторов и активность
+    пользователей распределены по Ципфу. После записи пересчитываются
+    счётчики, списки покупок и поисковый индекс.
+    """
+
+    def __init__(self, size, seed, log=None):
+        self.size = size
+        self.rng = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.prefix = DatasetSettings.USERNAME_PREFIX
+
+    def exists(self):
+        return User.objects.filter(username__startswith=self.prefix).exists()
+
+    def clear(self):
+        """
+        Удаляет сгенерированные данные прямыми DELETE по таблицам:
+        каскад ORM с сигналами на каждую строку на таких объёмах
+        занимает минуты. Затем пересчитываются производные данные
+        пользователей, которые остаются в базе.
+        """
+        users = User.objects.filter(username__startswith=self.prefix)
+        recipes = Recipe.objects.filter(author__in=users)
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        cart_users = list(ShoppingCart.objects.filter(
+            recipe__in=recipes
+        ).exclude(user__in=users).values_list('user_id', flat=True))
+        for queryset in (
+            Favorite.objects.filter(Q(user__in=users) | Q(recipe__in=recipes)),
+            ShoppingCart.objects.filter(Q(user__in=users)
+                                        | Q(recipe__in=recipes)),
+            Subscription.objects.filter(Q(user__in=users)
+                                        | Q(subscription__in=users)),
+            RecipeIngredient.objects.filter(recipe__in=recipes),
+            Recipe.tags.through.objects.filter(recipe__in=recipes),
+            GroceryItem.objects.filter(user__in=users),
+            Token.objects.filter(user__in=users),
+            recipes,
+        ):
+            queryset._raw_delete(queryset.db)
+        users.delete()
+        for counter in COUNTERS:
+            counter.recount()
+        grocery.rebuild(set(cart_users))
+        update_search_index(recipe_ids)
+        invalidate_recipes(recipe_ids)
+
+    def generate(self):
+        user_ids = self.timed('users', self.create_users)
+        tag_ids = self.get_or_create_tags()
+        ingredient_ids = self.get_or_create_ingredients()
+        authors = ZipfSampler(user_ids, self.rng)
+        recipe_ids = self.timed('recipes', self.create_recipes, authors)
+        self.timed('recipe links', self.create_recipe_links, recipe_ids,
+                   tag_ids, ingredient_ids)
+        users = ZipfSampler(user_ids, self.rng)
+        recipes = ZipfSampler(recipe_ids, self.rng)
+        self.timed('favorites', self.create_pairs, Favorite, 'recipe_id',
+                   users, recipes, self.size.favorites)
+        self.timed('carts', self.create_pairs, ShoppingCart, 'recipe_id',
+                   users, recipes, self.size.carts)
+        self.timed('subscriptions', self.create_pairs, Subscription,
+                   'subscription_id', users, authors,
+                   self.size.subscriptions)
+        self.timed('derived data', self.update_derived, user_ids, recipe_ids)
+
+    def timed(self, name, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        elapsed = time.perf_counter() - started
+        rows = len(result) if isinstance(result, list) else result
+        self.log(f'{name}: {elapsed:.1f} с'
+                 + (f', строк {rows}' if rows is not None else ''))
+        return result
+
+    def create_users(self):
+        writer = BulkWriter(User)
+        password = make_password(None)
+        now = timezone.now()
+        for number in range(self.size.users):
+            writer.add(
+                username=f'{self.prefix}{number}',
+                email=f'{self.prefix}{number}@example.com',
+                first_name=f'Имя{number}', last_name=f'Фамилия{number}',
+                password=password, date_joined=now
+            )
+        writer.flush()
+        user_ids = list(User.objects.filter(
+            username__startswith=self.prefix
+        ).order_by('id').values_list('id', flat=True))
+        tokens = BulkWriter(Token)
+        for user_id in user_ids:
+            tokens.add(key=Token.generate_key(), user_id=user_id,
+                       created=now)
+        tokens.flush()
+        return user_ids
+
+    def get_or_create_tags(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create([
+                Tag(name=name, slug=slug, color=color)
+                for name, slug, color in DatasetSettings.TAGS
+            ])
+            tag_catalog.bump_version()
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def get_or_create_ingredients(self):
+        if not Ingredient.objects.exists():
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+                 for number in range(DatasetSettings.INGREDIENTS)],
+                batch_size=DatasetSettings.BATCH_SIZE
+            )
+            ingredient_index.invalidate()
+            ingredient_catalog.bump_version()
+        return list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+
+    def create_recipes(self, authors):
+        writer = BulkWriter(Recipe)
+        now = timezone.now()
+        period = DatasetSettings.PUBLICATION_PERIOD.total_seconds()
+        words = DatasetSettings.RECIPE_WORDS
+        for number, author_id in enumerate(authors.choices(self.size.recipes)):
+            name = ' '.join(self.rng.sample(words, 3)).capitalize()
+            pub_date = now - timedelta(seconds=self.rng.random() * period)
+            writer.add(
+                name=f'{name} №{number}', author_id=author_id,
+                text=' '.join(self.rng.choices(words, k=40)),
+                cooking_time=self.rng.randint(5, 180),
+                image=DatasetSettings.IMAGE,
+                pub_date=pub_date, updated_at=pub_date
+            )
+        writer.flush()
+        return list(Recipe.objects.filter(
+            author__username__startswith=self.prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipe_links(self, recipe_ids, tag_ids, ingredient_ids):
+        ingredients = ZipfSampler(ingredient_ids, self.rng)
+        tags = BulkWriter(Recipe.tags.through)
+        links = BulkWriter(RecipeIngredient)
+        low, high = DatasetSettings.INGREDIENTS_PER_RECIPE
+        tags_low, tags_high = DatasetSettings.TAGS_PER_RECIPE
+        for recipe_id in recipe_ids:
+            for tag_id in self.rng.sample(
+                tag_ids, min(self.rng.randint(tags_low, tags_high),
+                             len(tag_ids))
+            ):
+                tags.add(recipe_id=recipe_id, tag_id=tag_id)
+            for ingredient_id in ingredients.sample(
+                self.rng.randint(low, high)
+            ):
+                links.add(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=self.rng.randint(1, 500))
+        tags.flush()
+        links.flush()
+        return links.written
+
+    def create_pairs(self, model, target_field, users, targets, total):
+        writer = BulkWriter(model)
+        per_user = users.distribute(total, len(targets) - 1)
+        for user_id in sorted(per_user):
+            exclude = user_id if model is Subscription else None
+            for target_id in targets.sample(per_user[user_id], exclude):
+                writer.add(user_id=user_id, **{target_field: target_id})
+        writer.flush()
+        return writer.written
+
+    def update_derived(self, user_ids, recipe_ids):
+        for counter in COUNTERS:
+            counter.recount()
+        grocery.rebuild(user_ids)
+        update_search_index(recipe_ids)
+        invalidate_recipes()
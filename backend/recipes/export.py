@@ -0,0 +1,72 @@
+import csv
+import json
+import re
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+from recipes.constants import ExportSettings
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _rows(grocery_list):
+    for item in grocery_list:
+        yield item['name'], item['measurement_unit'], item['amount_sum']
+
+
+def export_csv(grocery_list):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ExportSettings.CSV_HEADER)
+    for row in _rows(grocery_list):
+        yield writer.writerow(row)
+
+
+def export_txt(grocery_list):
+    for i, (name, unit, amount) in enumerate(_rows(grocery_list), start=1):
+        yield f'{i}. {name.capitalize()} - {amount} {unit}\n'
+
+
+def export_json(grocery_list):
+    separator = '['
+    for name, unit, amount in _rows(grocery_list):
+        yield separator + json.dumps({
+            'name': name, 'measurement_unit': unit, 'amount': amount
+        }, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+EXPORTERS = {
+    'csv': export_csv,
+    'txt': export_txt,
+    'json': export_json,
+}
+
+
+def get_export_response(request, grocery_list, export_format):
+    # Строки читаются из базы до возврата ответа: под ASGI тело
+    # StreamingHttpResponse потребляется в цикле событий, где запросы
+    # к базе запрещены. Строк не больше, чем ингредиентов в каталоге,
+    # а кодирование и сжатие по-прежнему идут потоком.
+    grocery_list = list(grocery_list)
+    content = (line.encode()
+               for line in EXPORTERS[export_format](grocery_list))
+    gzipped = ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if gzipped:
+        content = compress_sequence(content)
+    response = StreamingHttpResponse(
+        content, content_type=ExportSettings.CONTENT_TYPES[export_format]
+    )
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    file_name = ExportSettings.FILE_NAME.format(format=export_format)
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    return response
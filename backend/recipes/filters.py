@@ -1,6 +1,8 @@
-from django_filters import CharFilter, FilterSet, ModelMultipleChoiceFilter
+from django_filters import (CharFilter, FilterSet, ModelMultipleChoiceFilter,
+                            OrderingFilter)
 
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
 
 class RecipeFilter(FilterSet):
@@ -14,10 +16,15 @@ class RecipeFilter(FilterSet):
     )
     is_favorited = CharFilter(method='get_is_favorited')
     is_in_shopping_cart = CharFilter(method='get_is_in_shopping_cart')
+    search = CharFilter(method='get_search')
+    ordering = OrderingFilter(
+        fields=('pub_date', 'favorites_count', 'in_carts_count')
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_in_shopping_cart', 'is_favorited')
+        fields = ('author', 'tags', 'is_in_shopping_cart', 'is_favorited',
+                  'search')
 
     def get_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -31,9 +38,5 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=user)
         return queryset
 
-
-class IngredientFilter(FilterSet):
-    name = CharFilter(method='get_name')
-
-    def get_name(self, queryset, name, value):
-        return queryset.filter(name__icontains=value)
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,110 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from recipes.models import GroceryItem, RecipeIngredient, ShoppingCart
+
+BATCH_SIZE = 1000
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+
+
+def apply_delta(user_ids, delta):
+    """Прибавляет delta {ingredient_id: amount} к спискам покупок."""
+    delta = {key: value for key, value in delta.items() if value}
+    user_ids = list(user_ids)
+    if not delta or not user_ids:
+        return
+    with transaction.atomic():
+        GroceryItem.objects.bulk_create(
+            [GroceryItem(user_id=user_id, ingredient_id=ingredient_id,
+                         amount=0)
+             for user_id in user_ids for ingredient_id in delta],
+            batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        items = GroceryItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=delta.keys()
+        )
+        items.update(amount=F('amount') + Case(
+            *[When(ingredient_id=ingredient_id, then=Value(amount))
+              for ingredient_id, amount in delta.items()],
+            default=Value(0)
+        ))
+        items.filter(amount__lte=0).delete()
+
+
+def add_recipe(user_id, recipe_id):
+    apply_delta([user_id], get_recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_delta([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+def change_recipe(recipe_id, old_amounts, new_amounts):
+    delta = Counter(new_amounts)
+    delta.subtract(old_amounts)
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True)
+    apply_delta(user_ids, delta)
+
+
+def get_expected_items(user_ids=None):
+    queryset = ShoppingCart.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user__in=user_ids)
+    rows = queryset.values(
+        'user_id', ingredient_id=F('recipe__recipe_ingredients__ingredient')
+    ).annotate(
+        amount_sum=Sum('recipe__recipe_ingredients__amount')
+    ).filter(ingredient_id__isnull=False).order_by()
+    return {
+        (row['user_id'], row['ingredient_id']): row['amount_sum']
+        for row in rows
+    }
+
+
+def get_actual_items(user_ids=None):
+    queryset = GroceryItem.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user__in=user_ids)
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in queryset.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )
+    }
+
+
+def find_drift(user_ids=None):
+    expected = get_expected_items(user_ids)
+    actual = get_actual_items(user_ids)
+    return {
+        key: (expected.get(key), actual.get(key))
+        for key in expected.keys() | actual.keys()
+        if expected.get(key) != actual.get(key)
+    }
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    queryset = GroceryItem.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user__in=user_ids)
+    queryset.delete()
+    GroceryItem.objects.bulk_create(
+        [GroceryItem(user_id=user_id, ingredient_id=ingredient_id,
+                     amount=amount)
+         for (user_id, ingredient_id), amount
+         in get_expected_items(user_ids).items()],
+        batch_size=BATCH_SIZE
+    )
@@ -0,0 +1,166 @@
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from recipes.cache import RECIPE_GENERATION, invalidate_generations
+from recipes.constants import ImageSettings, Messages
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=ImageSettings.WORKERS, thread_name_prefix='image-variants'
+)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def _open(content):
+    try:
+        image = Image.open(io.BytesIO(content))
+        width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise InvalidImage(Messages.INVALID_IMAGE_ERROR)
+    if not (ImageSettings.MIN_SIDE <= min(width, height)
+            and max(width, height) <= ImageSettings.MAX_SIDE):
+        raise InvalidImage(Messages.IMAGE_DIMENSIONS_ERROR.format(
+            min_side=ImageSettings.MIN_SIDE, max_side=ImageSettings.MAX_SIDE
+        ))
+    if width * height > ImageSettings.MAX_PIXELS:
+        raise InvalidImage(Messages.IMAGE_PIXELS_ERROR.format(
+            megapixels=ImageSettings.MAX_PIXELS // 1_000_000
+        ))
+    return image
+
+
+def _encode(image, file_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, file_format, **options)
+    return buffer.getvalue()
+
+
+def _resized(image, size):
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    return image
+
+
+def canonicalize(content):
+    """
+    Проверяет изображение и возвращает (байты, расширение) уменьшенного
+    оригинала без метаданных: JPEG, либо PNG для картинок с прозрачностью.
+    """
+    image = _open(content)
+    image.draft('RGB', ImageSettings.CANONICAL_SIZE)
+    try:
+        image = ImageOps.exif_transpose(image)
+    except OSError:
+        raise InvalidImage(Messages.INVALID_IMAGE_ERROR)
+    image = _resized(image, ImageSettings.CANONICAL_SIZE)
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        return _encode(image.convert('RGBA'), 'PNG', optimize=True), 'png'
+    return _encode(image.convert('RGB'), 'JPEG', optimize=True,
+                   quality=ImageSettings.JPEG_QUALITY), 'jpg'
+
+
+def get_variant_name(name, variant):
+    suffix, ext = ImageSettings.VARIANTS[variant]
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    return f'{ImageSettings.VARIANTS_DIR}{stem}{suffix}.{ext}'
+
+
+def get_variant_urls(recipe, request):
+    if not recipe.image:
+        return None
+    if not recipe.has_image_variants:
+        url = request.build_absolute_uri(recipe.image.url)
+        return {variant: url for variant in ImageSettings.VARIANTS}
+    return {
+        variant: request.build_absolute_uri(default_storage.url(
+            get_variant_name(recipe.image.name, variant)
+        )) for variant in ImageSettings.VARIANTS
+    }
+
+
+class MediaUrls:
+    """
+    Абсолютные ссылки на файлы хранилища в рамках одного запроса.
+
+    Для FileSystemStorage адрес MEDIA_URL через build_absolute_uri
+    вычисляется один раз, а ссылка на файл получается дописыванием
+    имени, как это делает FileSystemStorage.url.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.prefix = None
+        if isinstance(default_storage, FileSystemStorage):
+            self.prefix = request.build_absolute_uri(default_storage.base_url)
+
+    def get(self, name):
+        if self.prefix is None:
+            return self.request.build_absolute_uri(default_storage.url(name))
+        return self.prefix + filepath_to_uri(name).lstrip('/')
+
+    def get_variants(self, name, has_image_variants):
+        if not name:
+            return None
+        if not has_image_variants:
+            url = self.get(name)
+            return {variant: url for variant in ImageSettings.VARIANTS}
+        return {
+            variant: self.get(get_variant_name(name, variant))
+            for variant in ImageSettings.VARIANTS
+        }
+
+
+def build_variants(name):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    thumbnail = _resized(image, ImageSettings.THUMBNAIL_SIZE)
+    sources = {'': image, '_thumb': thumbnail}
+    for variant, (suffix, ext) in ImageSettings.VARIANTS.items():
+        source = sources[suffix]
+        if ext == 'webp':
+            content = _encode(source, 'WEBP',
+                              quality=ImageSettings.WEBP_QUALITY)
+        else:
+            content = _encode(source.convert('RGB'), 'JPEG', optimize=True,
+                              quality=ImageSettings.JPEG_QUALITY)
+        variant_name = get_variant_name(name, variant)
+        default_storage.delete(variant_name)
+        default_storage.save(variant_name, ContentFile(content))
+
+
+def _build_recipe_variants(recipe_id, name):
+    from recipes.models import Recipe
+
+    try:
+        build_variants(name)
+        Recipe.objects.filter(id=recipe_id, image=name).update(
+            has_image_variants=True, updated_at=timezone.now()
+        )
+        invalidate_generations(RECIPE_GENERATION.format(pk=recipe_id))
+    except Exception:
+        logger.exception('Не удалось подготовить варианты %s', name)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe):
+    if recipe.image:
+        transaction.on_commit(partial(
+            _executor.submit, _build_recipe_variants,
+            recipe.id, recipe.image.name
+        ))
@@ -0,0 +1,363 @@
+import csv
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from recipes import grocery, images
+from recipes.cache import (USER_GENERATION, ingredient_catalog,
+                           invalidate_generations, invalidate_recipes,
+                           tag_catalog)
+from recipes.constants import ImportSettings
+from recipes.counters import COUNTERS
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                            Tag)
+from recipes.search import update_search_index
+from users.models import User
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.first_error = None
+        self.started = time.perf_counter()
+
+    def skip(self, number, reason):
+        self.skipped += 1
+        if self.first_error is None:
+            self.first_error = ImportSettings.ROW_ERROR.format(
+                number=number, reason=reason
+            )
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0
+
+    def __str__(self):
+        return (f'строк {self.rows}, создано {self.created}, '
+                f'обновлено {self.updated}, без изменений {self.unchanged}, '
+                f'пропущено {self.skipped}, '
+                f'{self.rows_per_second:.0f} строк/с')
+
+
+class RowError(ValueError):
+    """Строка файла не может быть загружена."""
+
+
+def _get_value(row, column):
+    value = row.get(column)
+    if value is None:
+        raise RowError(ImportSettings.MISSING_VALUE_ERROR.format(
+            column=column
+        ))
+    return value
+
+
+def _get_columns(row, prefix, suffix=''):
+    return [(column, value) for column, value in row.items()
+            if column and value and column.startswith(prefix)
+            and column.endswith(suffix)]
+
+
+def read_chunks(file, chunk_size, fieldnames=None):
+    rows = csv.DictReader(file, fieldnames=fieldnames)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class CsvImporter:
+    """
+    Потоковая загрузка CSV частями по chunk_size строк.
+
+    Строки сопоставляются с базой по естественному ключу key_fields:
+    новые создаются через bulk_create, у найденных bulk_update обновляет
+    update_fields. Каждая часть загружается в своей транзакции, поэтому
+    память и длина транзакции не зависят от размера файла.
+    """
+    model = None
+    key_fields = ()
+    update_fields = ()
+    fieldnames = None
+
+    def __init__(self, chunk_size=ImportSettings.CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def get_key(self, values):
+        return tuple(values[field] for field in self.key_fields)
+
+    def prepare(self, row):
+        return {field: _get_value(row, field)
+                for field in (*self.key_fields, *self.update_fields)}
+
+    def build(self, values):
+        return self.model(**values)
+
+    def get_existing(self, keys):
+        first_field = self.key_fields[0]
+        queryset = self.model.objects.filter(**{
+            f'{first_field}__in': {key[0] for key in keys}
+        })
+        return {self.get_key(vars(instance)): instance
+                for instance in queryset}
+
+    def import_file(self, file, on_chunk=None):
+        stats = ImportStats()
+        for rows in read_chunks(file, self.chunk_size, self.fieldnames):
+            with transaction.atomic():
+                self.import_chunk(rows, stats)
+            stats.rows += len(rows)
+            if on_chunk is not None:
+                on_chunk(stats)
+        self.finish()
+        return stats
+
+    def import_chunk(self, rows, stats):
+        prepared = {}
+        for number, row in enumerate(rows, start=stats.rows + 1):
+            try:
+                values = self.prepare(row)
+            except RowError as error:
+                stats.skip(number, error)
+                continue
+            except (KeyError, TypeError, ValueError) as error:
+                stats.skip(number, ImportSettings.INVALID_VALUE_ERROR.format(
+                    error=error
+                ))
+                continue
+            prepared[self.get_key(values)] = values
+        existing = self.get_existing(prepared.keys())
+        created, updated = [], []
+        for key, values in prepared.items():
+            instance = existing.get(key)
+            if instance is None:
+                created.append(self.build(values))
+                continue
+            changed = False
+            for field in self.update_fields:
+                if getattr(instance, field) != values[field]:
+                    setattr(instance, field, values[field])
+                    changed = True
+            if changed:
+                updated.append(instance)
+        self.model.objects.bulk_create(created, batch_size=self.chunk_size)
+        if updated:
+            self.model.objects.bulk_update(
+                updated, self.update_fields, batch_size=self.chunk_size
+            )
+        stats.created += len(created)
+        stats.updated += len(updated)
+        stats.unchanged += len(prepared) - len(created) - len(updated)
+        self.after_chunk(prepared, created, updated)
+
+    def after_chunk(self, prepared, created, updated):
+        pass
+
+    def finish(self):
+        pass
+
+
+class IngredientImporter(CsvImporter):
+    model = Ingredient
+    key_fields = ('name', 'measurement_unit')
+    fieldnames = ('name', 'measurement_unit')
+
+    def finish(self):
+        ingredient_index.invalidate()
+        ingredient_catalog.bump_version()
+
+
+class TagImporter(CsvImporter):
+    model = Tag
+    key_fields = ('slug',)
+    update_fields = ('name', 'color')
+
+    def finish(self):
+        tag_catalog.bump_version()
+
+
+class UserImporter(CsvImporter):
+    """
+    Пароль из файла хэшируется только для новых пользователей,
+    у существующих обновляются лишь имя и фамилия.
+    """
+    model = User
+    key_fields = ('email',)
+    update_fields = ('first_name', 'last_name')
+
+    def prepare(self, row):
+        values = super().prepare(row)
+        values['email'] = User.objects.normalize_email(values['email'])
+        values['username'] = _get_value(row, 'username')
+        values['password'] = _get_value(row, 'password')
+        email = self.taken.get(values['username'], values['email'])
+        if email.lower() != values['email'].lower():
+            raise RowError(ImportSettings.USERNAME_TAKEN_ERROR.format(
+                username=values['username']
+            ))
+        return values
+
+    def import_chunk(self, rows, stats):
+        self.taken = dict(User.objects.filter(
+            username__in=[row.get('username') for row in rows]
+        ).values_list('username', 'email'))
+        super().import_chunk(rows, stats)
+
+    def build(self, values):
+        return User(**{**values,
+                       'password': make_password(values['password'])})
+
+    def after_chunk(self, prepared, created, updated):
+        Recipe.objects.filter(author__in=updated).touch()
+        invalidate_generations(*(
+            USER_GENERATION.format(pk=user.pk) for user in updated
+        ))
+
+
+class RecipeImporter(CsvImporter):
+    """
+    Рецепты с колонками tags/N и ingredients/N/id, ingredients/N/amount.
+
+    Рецепт ищется по автору и названию. Теги и ингредиенты найденных
+    рецептов заменяются целиком, после чего обновляются дата изменения,
+    счётчики, списки покупок, поисковый индекс и кэш ответов затронутых
+    рецептов, так как bulk_create и bulk_update не вызывают сигналы.
+    Для новых и заменённых изображений заново готовятся уменьшенные копии.
+    """
+    model = Recipe
+    key_fields = ('name', 'author_id')
+    update_fields = ('text', 'cooking_time', 'image')
+
+    def __init__(self, author=None, **kwargs):
+        super().__init__(**kwargs)
+        self.author = author
+        self.relations = {}
+        self.image_names = {}
+
+    def get_existing(self, keys):
+        existing = super().get_existing(keys)
+        self.image_names = {recipe.id: recipe.image.name
+                            for recipe in existing.values()}
+        return existing
+
+    def prepare(self, row):
+        author_id = self.get_author_id(row)
+        if author_id is None:
+            raise RowError(ImportSettings.UNKNOWN_AUTHOR_ERROR)
+        tags = self.get_tag_ids(row)
+        if not tags:
+            raise RowError(ImportSettings.NO_TAGS_ERROR)
+        ingredients = self.get_ingredients(row)
+        if not ingredients:
+            raise RowError(ImportSettings.NO_INGREDIENTS_ERROR)
+        values = {
+            'name': _get_value(row, 'name'),
+            'author_id': author_id,
+            'text': _get_value(row, 'text'),
+            'cooking_time': int(_get_value(row, 'cooking_time')),
+            'image': row.get('image') or '',
+        }
+        self.relations[self.get_key(values)] = (tags, ingredients)
+        return values
+
+    def get_author_id(self, row):
+        email = row.get('author')
+        if not email:
+            return self.author.id if self.author else None
+        return self.authors.get(email)
+
+    def get_tag_ids(self, row):
+        tag_ids = set()
+        for _, value in _get_columns(row, 'tags/'):
+            tag_id = (int(value) if value.isdigit()
+                      else self.tag_slugs.get(value))
+            if tag_id not in self.tag_ids:
+                raise RowError(ImportSettings.UNKNOWN_TAG_ERROR.format(
+                    tag=value
+                ))
+            tag_ids.add(tag_id)
+        return tag_ids
+
+    def get_ingredients(self, row):
+        ingredients = {}
+        for column, value in _get_columns(row, 'ingredients/', '/id'):
+            amount = int(_get_value(row, f'{column[:-len("id")]}amount'))
+            ingredient_id = int(value)
+            if ingredient_id not in self.ingredient_ids:
+                raise RowError(ImportSettings.UNKNOWN_INGREDIENT_ERROR.format(
+                    ingredient=value
+                ))
+            ingredients[ingredient_id] = (
+                ingredients.get(ingredient_id, 0) + amount
+            )
+        return ingredients
+
+    def import_chunk(self, rows, stats):
+        emails = {row['author'] for row in rows if row.get('author')}
+        self.authors = dict(User.objects.filter(
+            email__in=emails
+        ).values_list('email', 'id'))
+        tags = list(Tag.objects.values_list('id', 'slug'))
+        self.tag_ids = {tag_id for tag_id, _ in tags}
+        self.tag_slugs = {slug: tag_id for tag_id, slug in tags}
+        self.ingredient_ids = set(Ingredient.objects.filter(id__in={
+            int(value) for row in rows
+            for _, value in _get_columns(row, 'ingredients/', '/id')
+            if value.isdigit()
+        }).values_list('id', flat=True))
+        self.relations = {}
+        super().import_chunk(rows, stats)
+
+    def after_chunk(self, prepared, created, updated):
+        image_names = self.image_names
+        recipes = self.get_existing(prepared.keys())
+        recipe_ids = [recipe.id for recipe in recipes.values()]
+        Recipe.objects.filter(id__in=recipe_ids).touch()
+        new_images = [recipe for recipe in recipes.values()
+                      if recipe.image.name != image_names.get(recipe.id)]
+        Recipe.objects.filter(
+            id__in=[recipe.id for recipe in new_images]
+        ).update(has_image_variants=False)
+        for recipe in new_images:
+            images.schedule_variants(recipe)
+        Recipe.tags.through.objects.filter(recipe__in=recipe_ids).delete()
+        RecipeIngredient.objects.filter(recipe__in=recipe_ids).delete()
+        Recipe.tags.through.objects.bulk_create(
+            [Recipe.tags.through(recipe_id=recipes[key].id, tag_id=tag_id)
+             for key, (tag_ids, _) in self.relations.items()
+             for tag_id in tag_ids],
+            batch_size=self.chunk_size
+        )
+        RecipeIngredient.objects.bulk_create(
+            [RecipeIngredient(recipe_id=recipes[key].id,
+                              ingredient_id=ingredient_id, amount=amount)
+             for key, (_, ingredients) in self.relations.items()
+             for ingredient_id, amount in ingredients.items()],
+            batch_size=self.chunk_size
+        )
+        recipes_counter = next(counter for counter in COUNTERS
+                               if counter.related_model is Recipe)
+        for author_id, count in Counter(
+            recipe.author_id for recipe in created
+        ).items():
+            recipes_counter.add(author_id, count)
+        cart_users = list(ShoppingCart.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('user_id', flat=True).distinct())
+        if cart_users:
+            grocery.rebuild(cart_users)
+        update_search_index(recipe_ids)
+        invalidate_recipes(recipe_ids)
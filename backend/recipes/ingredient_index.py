@@ -0,0 +1,149 @@
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from recipes.models import Ingredient
+
+VERSION_CACHE_KEY = 'ingredient_index_version'
+TRIGRAM_SIZE = 3
+
+
+def _normalize(value):
+    return value.strip().casefold()
+
+
+def _trigrams(value):
+    return {value[i:i + TRIGRAM_SIZE]
+            for i in range(len(value) - TRIGRAM_SIZE + 1)}
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Сначала отдаются совпадения по началу названия, затем по началу
+    слова и в конце по любой подстроке (кандидаты ищутся по триграммам).
+    Версия индекса хранится в кэше: изменение ингредиента в одном
+    процессе приводит к перестроению индекса в остальных.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self._ingredients = {}
+        self._keys = []
+        self._trigrams = defaultdict(set)
+
+    def search(self, query):
+        query = _normalize(query)
+        with self._lock:
+            self._ensure_fresh()
+            if not query:
+                return [self._ingredients[pk] for _, pk in self._keys]
+            prefix = self._prefix_matches(query)
+            found = set(prefix)
+            word_prefix, substring = [], []
+            for key, pk in self._substring_candidates(query):
+                if pk in found or query not in key:
+                    continue
+                if f' {query}' in key:
+                    word_prefix.append((key, pk))
+                else:
+                    substring.append((key, pk))
+            ranked = (prefix + [pk for _, pk in sorted(word_prefix)]
+                      + [pk for _, pk in sorted(substring)])
+            return [self._ingredients[pk] for pk in ranked]
+
+    def rebuild(self):
+        version = self._get_shared_version()
+        rows = Ingredient.objects.values('id', 'name', 'measurement_unit')
+        with self._lock:
+            self._ingredients = {}
+            self._keys = []
+            self._trigrams = defaultdict(set)
+            for row in rows.iterator():
+                self._add(row)
+            self._keys.sort()
+            self._version = version
+
+    def update(self, ingredient):
+        with self._lock:
+            self._remove(ingredient.pk)
+            self._add({
+                'id': ingredient.pk,
+                'name': ingredient.name,
+                'measurement_unit': ingredient.measurement_unit,
+            }, keep_sorted=True)
+            self._bump_version()
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(pk)
+            self._bump_version()
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._bump_version()
+
+    def _ensure_fresh(self):
+        if self._version != self._get_shared_version():
+            self.rebuild()
+
+    def _prefix_matches(self, query):
+        start = bisect_left(self._keys, (query,))
+        matches = []
+        for key, pk in self._keys[start:]:
+            if not key.startswith(query):
+                break
+            matches.append(pk)
+        return matches
+
+    def _substring_candidates(self, query):
+        if len(query) < TRIGRAM_SIZE:
+            return self._keys
+        postings = sorted((self._trigrams.get(trigram, set())
+                           for trigram in _trigrams(query)), key=len)
+        candidates = set.intersection(*postings)
+        return [(_normalize(self._ingredients[pk]['name']), pk)
+                for pk in candidates]
+
+    def _add(self, row, keep_sorted=False):
+        key = (_normalize(row['name']), row['id'])
+        self._ingredients[row['id']] = row
+        if keep_sorted:
+            insort(self._keys, key)
+        else:
+            self._keys.append(key)
+        for trigram in _trigrams(key[0]):
+            self._trigrams[trigram].add(row['id'])
+
+    def _remove(self, pk):
+        row = self._ingredients.pop(pk, None)
+        if row is None:
+            return
+        key = (_normalize(row['name']), pk)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+        for trigram in _trigrams(key[0]):
+            self._trigrams[trigram].discard(pk)
+
+    @staticmethod
+    def _get_shared_version():
+        return cache.get_or_set(VERSION_CACHE_KEY, 1, timeout=None)
+
+    def _bump_version(self):
+        try:
+            version = cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            version = self._get_shared_version()
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+        else:
+            self._version = None
+
+
+ingredient_index = IngredientIndex()
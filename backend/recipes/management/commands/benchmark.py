@@ -0,0 +1,150 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from recipes import benchmark
+from recipes.constants import BenchmarkSettings
+
+COLUMNS = ('requests', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms',
+           'queries', 'sql_ms', 'errors')
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон API по смеси запросов из коллекции '
+            'Postman с отчётом по задержкам и SQL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n', '--requests', type=int, default=1000,
+            help='Число сценариев в прогоне'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=50,
+            help='Число сценариев для прогрева, не входят в отчёт'
+        )
+        parser.add_argument(
+            '--scale', type=int, default=1,
+            help='Множитель объёма синтетических данных'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Зерно генератора данных и смеси запросов'
+        )
+        # Коллекция лежит вне backend/ и не попадает в образ, поэтому
+        # без неё путь нужно передать явно.
+        collection = settings.BASE_DIR / BenchmarkSettings.COLLECTION_PATH
+        parser.add_argument(
+            '--collection',
+            default=collection if collection.exists() else None,
+            required=not collection.exists(),
+            help='Путь к коллекции Postman, по умолчанию '
+                 f'{BenchmarkSettings.COLLECTION_PATH} от backend/'
+        )
+        parser.add_argument(
+            '--writes', action='store_true',
+            help='Добавить в смесь добавление и удаление избранного, '
+                 'корзины и подписок'
+        )
+        parser.add_argument(
+            '--url',
+            help='Адрес запущенного сервера, по умолчанию тестовый клиент'
+        )
+        parser.add_argument(
+            '-c', '--concurrency', type=int, default=1,
+            help='Число параллельных потоков, только вместе с --url'
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Число медленных клиентов на время прогона, '
+                 'только вместе с --url'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Файл для отчёта в JSON'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Отчёт в JSON, с которым сравнить результаты'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95 относительно базового отчёта'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > 1 and not options['url']:
+            raise CommandError('--concurrency работает только с --url')
+        if options['slow_clients'] and not options['url']:
+            raise CommandError('--slow-clients работает только с --url')
+        scenarios = benchmark.load_scenarios(
+            options['collection'], options['writes']
+        )
+        if not scenarios:
+            raise CommandError('В коллекции не найдено подходящих запросов')
+        dataset = benchmark.seed_dataset(options['scale'], options['seed'])
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        if options['url']:
+            target = benchmark.LiveTarget(options['url'], dataset.tokens)
+            with benchmark.SlowClients(options['url'],
+                                       options['slow_clients']):
+                report = self.run(target, scenarios, dataset, options)
+        else:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+            ):
+                target = benchmark.ClientTarget(dataset.tokens)
+                report = self.run(target, scenarios, dataset, options)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self.check_baseline(report, options)
+
+    def run(self, target, scenarios, dataset, options):
+        seed = options['seed']
+        warmup = benchmark.build_plan(
+            scenarios, dataset, options['warmup'], seed
+        )
+        benchmark.run_plan(warmup, target, options['concurrency'])
+        plan = benchmark.build_plan(
+            scenarios, dataset, options['requests'], seed + 1
+        )
+        samples, wall_time = benchmark.run_plan(
+            plan, target, options['concurrency']
+        )
+        return benchmark.summarize(samples, wall_time)
+
+    def print_report(self, report):
+        width = max(map(len, report['endpoints']))
+        self.stdout.write(
+            'endpoint'.ljust(width)
+            + ''.join(column.rjust(12) for column in COLUMNS)
+        )
+        for name, endpoint in report['endpoints'].items():
+            self.stdout.write(name.ljust(width) + ''.join(
+                str('-' if endpoint[column] is None
+                    else endpoint[column]).rjust(12)
+                for column in COLUMNS
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов: {report["requests"]} за {report["wall_time_s"]} с, '
+            f'{report["throughput"]} в секунду'
+        ))
+
+    def check_baseline(self, report, options):
+        with open(options['baseline'], encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = benchmark.compare(
+            report, baseline, options['threshold']
+        )
+        for name, metric, old, new in regressions:
+            self.stdout.write(self.style.WARNING(
+                f'{name}: {metric} {old} -> {new}'
+            ))
+        if regressions:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from recipes import benchmark
+from users.models import User
+
+COLUMNS = ('items', 'queries', 'per_item_us', 'python_per_item_us')
+
+
+class Command(BaseCommand):
+    help = ('Сравнение стоимости одного рецепта в RecipeSerializer '
+            'и RecipeReadSerializer на странице списка.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-l', '--limit', type=int, default=100,
+            help='Число рецептов на странице'
+        )
+        parser.add_argument(
+            '-r', '--repeat', type=int, default=20,
+            help='Число повторов для каждого сериализатора'
+        )
+        parser.add_argument(
+            '--scale', type=int, default=1,
+            help='Множитель объёма синтетических данных'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Зерно генератора данных'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого строить ответ, '
+                 'по умолчанию аноним'
+        )
+
+    def handle(self, *args, **options):
+        benchmark.seed_dataset(options['scale'], options['seed'])
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError('Пользователь не найден')
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            report, identical = benchmark.measure_serializers(
+                options['limit'], options['repeat'], user
+            )
+        width = max(map(len, report))
+        self.stdout.write(
+            'serializer'.ljust(width)
+            + ''.join(column.rjust(20) for column in COLUMNS)
+        )
+        for name, row in report.items():
+            self.stdout.write(name.ljust(width) + ''.join(
+                str(row[column]).rjust(20) for column in COLUMNS
+            ))
+        if not identical:
+            raise CommandError('Сериализаторы вернули разный JSON')
+        self.stdout.write(self.style.SUCCESS('JSON совпадает'))
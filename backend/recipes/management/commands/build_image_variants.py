@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from recipes.cache import RECIPE_GENERATION, invalidate_generations
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Подготовка уменьшенных копий и WebP для изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-a', '--all', action='store_true',
+            help='Пересобрать копии и для уже обработанных рецептов'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.filter(has_image_variants=False)
+        done = 0
+        for recipe_id, name in recipes.values_list('id', 'image').iterator():
+            try:
+                build_variants(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            Recipe.objects.filter(id=recipe_id, image=name).update(
+                has_image_variants=True, updated_at=timezone.now()
+            )
+            invalidate_generations(RECIPE_GENERATION.format(pk=recipe_id))
+            done += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано изображений: {done}')
+        )
@@ -1,33 +1,48 @@
-import csv
-
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
 from foodgram import settings
-from recipes.models import Ingredient
-
-MODEL_FILE_MAPPING = {
-    Ingredient: 'ingredients.csv'
-}
+from recipes.constants import ImportSettings
+from recipes.importers import IngredientImporter
 
-MODEL_HEADERS_MAPPING = {
-    Ingredient: ('name', 'measurement_unit')
+IMPORTER_FILE_MAPPING = {
+    IngredientImporter: 'ingredients.csv'
 }
 
 
 class Command(BaseCommand):
     help = 'Команда для загрузки csv файлов в базу данных.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-s', '--chunk-size', type=int,
+            default=ImportSettings.CHUNK_SIZE,
+            help='Число строк, загружаемых за одну транзакцию'
+        )
+
     def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
         folder_path = str(settings.BASE_DIR) + '/data/'
-        for model, file_name in MODEL_FILE_MAPPING.items():
+        failed = []
+        for importer_class, file_name in IMPORTER_FILE_MAPPING.items():
             file_path = folder_path + file_name
-            with open(file_path,
-                      newline='\n',
-                      encoding='utf-8') as file:
-                data = csv.DictReader(
-                    file, fieldnames=MODEL_HEADERS_MAPPING[model]
-                )
-                values = [model(**row) for row in data]
-                model.objects.all().delete()
-                model.objects.bulk_create(values)
-                self.stdout.write(self.style.SUCCESS(f'{file_name} is loaded'))
+            importer = importer_class(chunk_size=options['chunk_size'])
+            with open(file_path, newline='', encoding='utf-8') as file:
+                stats = importer.import_file(file, self.report_progress)
+            if stats.skipped:
+                failed.append(file_name)
+                self.stderr.write(self.style.WARNING(
+                    f'{file_name} is loaded with skipped rows: {stats}; '
+                    f'первая ошибка: {stats.first_error}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{file_name} is loaded: {stats}'
+                ))
+        if failed:
+            raise CommandError(
+                f'Не все строки загружены: {", ".join(failed)}'
+            )
+
+    def report_progress(self, stats):
+        if self.verbosity > 1:
+            self.stdout.write(str(stats))
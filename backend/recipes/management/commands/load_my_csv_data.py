@@ -1,15 +1,14 @@
-import csv
-
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
 from foodgram import settings
-from recipes.models import Recipe, Tag
+from recipes.constants import ImportSettings
+from recipes.importers import RecipeImporter, TagImporter, UserImporter
 from users.models import User
 
-MODEL_FILE_MAPPING = {
-    User: 'users.csv',
-    Tag: 'tags.csv',
-    Recipe: 'recipes.csv'
+IMPORTER_FILE_MAPPING = {
+    UserImporter: 'users.csv',
+    TagImporter: 'tags.csv',
+    RecipeImporter: 'recipes.csv'
 }
 
 DEFAULT_PATH = str(settings.BASE_DIR) + '/data/'
@@ -34,19 +33,58 @@ class Command(BaseCommand):
             help='Путь к загружаемым файлам'
         )
 
+        parser.add_argument(
+            '-a', '--author', type=str,
+            help='Email автора для рецептов без колонки author'
+        )
+
+        parser.add_argument(
+            '-s', '--chunk-size', type=int,
+            default=ImportSettings.CHUNK_SIZE,
+            help='Число строк, загружаемых за одну транзакцию'
+        )
+
     def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
         folder_path = options['path'] or DEFAULT_PATH
-        file_names = [file if file[-4] == '.csv' else f'{file}.csv'
-                      for file in options['files']]
-
-        for model, file_name in MODEL_FILE_MAPPING.items():
+        file_names = [file if file.endswith('.csv') else f'{file}.csv'
+                      for file in options['files'] or ()]
+        failed = []
+        for importer_class, file_name in IMPORTER_FILE_MAPPING.items():
             if file_names and file_name not in file_names:
                 continue
+            importer = importer_class(chunk_size=options['chunk_size'],
+                                      **self.get_options(importer_class,
+                                                         options))
+            if options['clear']:
+                importer.model.objects.all().delete()
             file_path = folder_path + file_name
-            with open(file_path, newline='\n', encoding='utf-8') as file:
-                data = csv.DictReader(file)
-                values = [model(row) for row in data]
-                if options['clear']:
-                    model.objects.all().delete()
-                model.objects.bulk_create(values)
-                self.stdout.write(self.style.SUCCESS(f'{file_name} is loaded'))
+            with open(file_path, newline='', encoding='utf-8') as file:
+                stats = importer.import_file(file, self.report_progress)
+            if stats.skipped:
+                failed.append(file_name)
+                self.stderr.write(self.style.WARNING(
+                    f'{file_name} is loaded with skipped rows: {stats}; '
+                    f'первая ошибка: {stats.first_error}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{file_name} is loaded: {stats}'
+                ))
+        if failed:
+            raise CommandError(
+                f'Не все строки загружены: {", ".join(failed)}'
+            )
+
+    @staticmethod
+    def get_options(importer_class, options):
+        if importer_class is not RecipeImporter or not options['author']:
+            return {}
+        try:
+            return {'author': User.objects.get(email=options['author'])}
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["author"]} не найден')
+
+    def report_progress(self, stats):
+        if self.verbosity > 1:
+            self.stdout.write(str(stats))
@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand, CommandError
+
+from recipes import grocery
+
+
+class Command(BaseCommand):
+    help = 'Проверка и пересборка списков покупок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить расхождения, ничего не меняя'
+        )
+
+        parser.add_argument(
+            '-u', '--users', type=int, nargs='+',
+            help='id пользователей, списки которых нужно обработать'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        drift = grocery.find_drift(user_ids)
+        for (user_id, ingredient_id), (expected, actual) in drift.items():
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидалось {expected}, в таблице {actual}'
+            )
+        if options['check']:
+            if drift:
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        grocery.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, исправлено: {len(drift)}'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import COUNTERS
+
+
+class Command(BaseCommand):
+    help = 'Проверка и пересчёт денормализованных счётчиков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить расхождения, ничего не меняя'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for counter in COUNTERS:
+            drift = counter.count_drift()
+            total += drift
+            self.stdout.write(f'{counter}: расхождений {drift}')
+        if options['check']:
+            if total:
+                raise CommandError(f'Найдено расхождений: {total}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        with transaction.atomic():
+            for counter in COUNTERS:
+                counter.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны, исправлено: {total}'
+        ))
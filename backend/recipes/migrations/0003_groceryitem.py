@@ -0,0 +1,52 @@
+# Generated by Django 3.2.3 on 2026-10-16 22:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F, Sum
+
+
+def fill_grocery_items(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    GroceryItem = apps.get_model('recipes', 'GroceryItem')
+    rows = ShoppingCart.objects.values(
+        'user_id', ingredient_id=F('recipe__recipe_ingredients__ingredient')
+    ).annotate(
+        amount_sum=Sum('recipe__recipe_ingredients__amount')
+    ).filter(ingredient_id__isnull=False).order_by()
+    GroceryItem.objects.bulk_create(
+        [GroceryItem(user_id=row['user_id'],
+                     ingredient_id=row['ingredient_id'],
+                     amount=row['amount_sum']) for row in rows],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroceryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.BigIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grocery_items', to='recipes.ingredient', verbose_name='Ингридиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grocery_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'позиция списка покупок',
+                'verbose_name_plural': 'Списки покупок',
+                'ordering': ('user', 'ingredient'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='groceryitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='user_ingredient_grocery_item'),
+        ),
+        migrations.RunPython(fill_grocery_items, migrations.RunPython.noop),
+    ]
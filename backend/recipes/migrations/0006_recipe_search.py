@@ -0,0 +1,67 @@
+# Generated by Django 3.2.3 on 2026-10-16 22:34
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRESQL_INDEX = 'recipes_recipe_search_vector_gin'
+POSTGRESQL_FILL = """
+UPDATE recipes_recipe r SET search_vector =
+    setweight(to_tsvector('russian', r.name), 'A')
+    || setweight(to_tsvector('russian', COALESCE((
+        SELECT string_agg(i.name, ' ')
+        FROM recipes_recipeingredient ri
+        JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', r.text), 'C')
+"""
+SQLITE_TABLE = 'recipes_recipe_fts'
+SQLITE_FILL = f"""
+INSERT INTO {SQLITE_TABLE} (rowid, name, text, ingredients)
+SELECT r.id, r.name, r.text, COALESCE((
+    SELECT group_concat(i.name, ' ')
+    FROM recipes_recipeingredient ri
+    JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+    WHERE ri.recipe_id = r.id
+), '') FROM recipes_recipe r
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {POSTGRESQL_INDEX} ON recipes_recipe '
+            'USING gin (search_vector)'
+        )
+        schema_editor.execute(POSTGRESQL_FILL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {SQLITE_TABLE} '
+            'USING fts5(name, text, ingredients)'
+        )
+        schema_editor.execute(SQLITE_FILL)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {POSTGRESQL_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 3.2.3 on 2026-10-16 23:17
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+COUNTER_FIELDS = {
+    'Favorite': 'favorites_count',
+    'ShoppingCart': 'in_carts_count',
+}
+
+
+def remove_duplicates(model, fields):
+    """
+    Оставляет по одной строке на каждое сочетание fields, возвращает
+    сочетания, у которых были повторы.
+    """
+    duplicates = list(model.objects.values(*fields).annotate(
+        keep_id=Min('id'), rows=Count('id')
+    ).filter(rows__gt=1).order_by())
+    for row in duplicates:
+        model.objects.filter(
+            **{field: row[field] for field in fields}
+        ).exclude(id=row['keep_id']).delete()
+    return duplicates
+
+
+def remove_duplicate_records(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model_name, counter_field in COUNTER_FIELDS.items():
+        model = apps.get_model('recipes', model_name)
+        duplicates = remove_duplicates(model, ('user_id', 'recipe_id'))
+        if not duplicates:
+            continue
+        Recipe.objects.filter(
+            id__in={row['recipe_id'] for row in duplicates}
+        ).update(**{counter_field: Coalesce(Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+                'recipe'
+            ).annotate(count=Count('pk')).values('count')
+        ), 0)})
+        if model_name == 'ShoppingCart':
+            rebuild_grocery_items(
+                apps, {row['user_id'] for row in duplicates}
+            )
+
+
+def rebuild_grocery_items(apps, user_ids):
+    GroceryItem = apps.get_model('recipes', 'GroceryItem')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    GroceryItem.objects.filter(user__in=user_ids).delete()
+    rows = ShoppingCart.objects.filter(user__in=user_ids).values(
+        'user_id', ingredient_id=F('recipe__recipe_ingredients__ingredient')
+    ).annotate(
+        amount_sum=Sum('recipe__recipe_ingredients__amount')
+    ).filter(ingredient_id__isnull=False).order_by()
+    GroceryItem.objects.bulk_create([
+        GroceryItem(user_id=row['user_id'], ingredient_id=row['ingredient_id'],
+                    amount=row['amount_sum'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_records,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='user_recipe_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='user_recipe_shopping_cart'),
+        ),
+    ]
@@ -1,9 +1,15 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import F, Prefetch, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
+from foodgram.db import DerivedFieldsMixin
 from recipes.constants import Limits
-from users.models import User
+from users.models import Subscription, User
 
 
 class Ingredient(models.Model):
@@ -49,7 +55,48 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    @staticmethod
+    def prefetches():
+        return (
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('ingredient__name')
+            )
+        )
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            *self.prefetches()
+        )
+
+    def limited_per_author(self, limit):
+        ranked = self.annotate(recipe_rank=Window(
+            RowNumber(),
+            partition_by=F('author'),
+            order_by=(F('pub_date').desc(), F('id').desc())
+        )).order_by().values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.filter(id__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.recipe_rank <= %s',
+            (*params, limit)
+        ))
+
+    def touch(self):
+        """Отмечает рецепты изменёнными, для правок в обход save()."""
+        return self.update(updated_at=timezone.now())
+
+    def followed_by(self, user):
+        return self.filter(author__in=Subscription.objects.filter(
+            user=user
+        ).values('subscription'))
+
+
+class Recipe(DerivedFieldsMixin, models.Model):
     name = models.CharField(
         max_length=Limits.MAX_STANDARD_FIELD_LENGTH,
         verbose_name='Название',
@@ -66,6 +113,11 @@ class Recipe(models.Model):
         default=None,
         verbose_name='Изображение'
     )
+    has_image_variants = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения готовы'
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='RecipeIngredient',
@@ -90,11 +142,42 @@ class Recipe(models.Model):
         verbose_name='Дата создания',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    derived_fields = ('favorites_count', 'in_carts_count', 'search_vector')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.name
@@ -137,10 +220,12 @@ class Favorite(models.Model):
         ordering = ('user', 'recipe')
         verbose_name = 'избранное'
         verbose_name_plural = 'Избранные'
-        models.UniqueConstraint(
-            fields=['user', 'recipe'],
-            name='user_recipe_favorite'
-        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='user_recipe_favorite'
+            )
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -159,7 +244,36 @@ class ShoppingCart(models.Model):
         ordering = ('user', 'recipe')
         verbose_name = 'продукт'
         verbose_name_plural = 'Продукты'
-        models.UniqueConstraint(
-            fields=['user', 'recipe'],
-            name='user_recipe_shopping_cart'
-        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='user_recipe_shopping_cart'
+            )
+        ]
+
+
+class GroceryItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='grocery_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        related_name='grocery_items',
+        verbose_name='Ингридиент'
+    )
+    amount = models.BigIntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        ordering = ('user', 'ingredient')
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='user_ingredient_grocery_item'
+            )
+        ]
@@ -0,0 +1,80 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       LimitOffsetPagination)
+
+from recipes.constants import Messages
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Курсор по дате публикации. Порядок задаёт сам курсор, поэтому
+    запрос с ?ordering= или ?search=, меняющими порядок, отклоняется
+    с 400, а не отдаётся молча в другом порядке.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    ordering_query_params = ('ordering', 'search')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        errors = {
+            param: [Messages.CURSOR_ORDERING_ERROR]
+            for param in self.ordering_query_params
+            if any(value.strip()
+                   for value in request.query_params.getlist(param))
+        }
+        if errors:
+            raise ValidationError(errors)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = ('id',)
+    page_size_query_param = 'limit'
+
+
+class LimitOffsetOrCursorPagination(BasePagination):
+    """
+    По умолчанию limit/offset, а при ?pagination=cursor — курсорная
+    пагинация без OFFSET и COUNT(*), устойчивая к новым записям.
+    Курсорная пагинация идёт в своём фиксированном порядке.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    default_pagination_class = LimitOffsetPagination
+    cursor_pagination_class = IdCursorPagination
+
+    def __init__(self):
+        self.paginator = self.default_pagination_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == self.cursor_mode:
+            self.paginator = self.cursor_pagination_class()
+        else:
+            self.paginator = self.default_pagination_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def get_schema_fields(self, view):
+        return self.paginator.get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.paginator.get_schema_operation_parameters(view)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+
+class RecipePagination(LimitOffsetOrCursorPagination):
+    cursor_pagination_class = RecipeCursorPagination
@@ -0,0 +1,66 @@
+import hashlib
+import io
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from foodgram.metrics import PDF_RENDER_LATENCY, count_cache_lookup
+from recipes.constants import PdfSettings
+
+
+def register_fonts():
+    if PdfSettings.FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(
+            PdfSettings.FONT, settings.BASE_DIR / PdfSettings.FONT_PATH
+        ))
+
+
+def get_grocery_list_hash(grocery_list):
+    rows = [(item['name'], item['measurement_unit'], item['amount_sum'])
+            for item in grocery_list]
+    return hashlib.sha256(
+        json.dumps(rows, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def render_grocery_list(grocery_list, pdf_settings=PdfSettings):
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, invariant=True)
+    page.setFont(pdf_settings.FONT, pdf_settings.TITLE_FONT_SIZE)
+    page.drawString(*pdf_settings.TITLE_X_Y, text=pdf_settings.TITLE_TEXT)
+    page.setFont(pdf_settings.FONT, pdf_settings.TEXT_FONT_SIZE)
+    row_y = pdf_settings.ROW_START_Y
+
+    for i, item in enumerate(grocery_list, start=1):
+        row_y -= pdf_settings.ROW_SHIFT_Y
+        if row_y < pdf_settings.ROW_END_Y:
+            page.showPage()
+            page.setFont(pdf_settings.FONT, pdf_settings.TEXT_FONT_SIZE)
+            row_y = (pdf_settings.NEXT_PAGE_ROW_START_Y
+                     - pdf_settings.ROW_SHIFT_Y)
+        name = item['name'].capitalize()
+        amount = item['amount_sum']
+        unit = item['measurement_unit']
+
+        page.drawString(pdf_settings.INGREDIENT_X, row_y, f'{i}. {name}')
+        page.drawString(pdf_settings.AMOUNT_X, row_y, f'{amount} {unit}')
+
+    page.showPage()
+    page.save()
+    return buffer.getvalue()
+
+
+def get_grocery_list_pdf(grocery_list):
+    key = (f'{PdfSettings.CACHE_PREFIX}:'
+           f'{get_grocery_list_hash(grocery_list)}')
+    pdf = cache.get(key)
+    count_cache_lookup(PdfSettings.CACHE_PREFIX, pdf is not None)
+    if pdf is None:
+        with PDF_RENDER_LATENCY.time():
+            pdf = render_grocery_list(grocery_list)
+        cache.set(key, pdf, PdfSettings.CACHE_TIMEOUT)
+    return pdf
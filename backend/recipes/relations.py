@@ -0,0 +1,94 @@
+from array import array
+from bisect import bisect_left
+from hashlib import sha1
+
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.metrics import count_cache_lookup
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+RELATIONS_KEY = 'relations:{user_id}'
+RELATIONS_TIMEOUT = 60 * 60
+RELATION_QUERIES = {
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'subscriptions': (Subscription, 'subscription_id'),
+}
+
+
+class IdSet:
+    """Отсортированный массив id с проверкой вхождения бинарным поиском."""
+
+    def __init__(self, data=b''):
+        self.ids = array('q')
+        self.ids.frombytes(data)
+
+    def __contains__(self, pk):
+        index = bisect_left(self.ids, pk)
+        return index < len(self.ids) and self.ids[index] == pk
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class UserRelations:
+    """
+    Id рецептов в избранном и в корзине пользователя и id авторов,
+    на которых он подписан.
+
+    Хранятся в кэше одной записью из упакованных массивов id, поэтому
+    флаги is_favorited, is_in_shopping_cart и is_subscribed проверяются
+    без запросов к базе. При изменении связей запись удаляется после
+    коммита и собирается заново при следующем обращении: обновление
+    на месте через чтение и запись кэша теряло бы параллельные изменения.
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        for name in RELATION_QUERIES:
+            setattr(self, name, IdSet(data.get(name, b'')))
+
+    def get_digest(self):
+        """Хэш всех связей, меняется при любом их изменении."""
+        digest = sha1()
+        for name in RELATION_QUERIES:
+            ids = getattr(self, name).ids
+            digest.update(b'%d:' % len(ids))
+            digest.update(ids.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_key(user_id):
+        return RELATIONS_KEY.format(user_id=user_id)
+
+    @classmethod
+    def load(cls, user_id):
+        key = cls.get_key(user_id)
+        data = cache.get(key)
+        count_cache_lookup('relations', data is not None)
+        if data is None:
+            data = {
+                name: array('q', sorted(model.objects.filter(
+                    user_id=user_id
+                ).values_list(field, flat=True))).tobytes()
+                for name, (model, field) in RELATION_QUERIES.items()
+            }
+            cache.set(key, data, RELATIONS_TIMEOUT)
+        return cls(data)
+
+    @classmethod
+    def invalidate(cls, user_id):
+        key = cls.get_key(user_id)
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_relations(user):
+    """Связи пользователя, загруженные один раз на запрос."""
+    if not user.is_authenticated:
+        return UserRelations()
+    relations = getattr(user, '_relations', None)
+    if relations is None:
+        relations = user._relations = UserRelations.load(user.id)
+    return relations
@@ -0,0 +1,112 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+BATCH_SIZE = 500
+
+
+def _batches(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        yield recipe_ids[start:start + BATCH_SIZE]
+
+
+def _ingredient_names():
+    return Coalesce(Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    ), Value(''))
+
+
+def _search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_ingredient_names(), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def _update_postgresql(recipe_ids):
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+    recipes.update(search_vector=_search_vector())
+
+
+def _update_sqlite(recipe_ids):
+    select = (
+        f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+        'SELECT r.id, r.name, r.text, COALESCE(('
+        ' SELECT group_concat(i.name, \' \')'
+        ' FROM recipes_recipeingredient ri'
+        ' JOIN recipes_ingredient i ON i.id = ri.ingredient_id'
+        ' WHERE ri.recipe_id = r.id'
+        '), \'\') FROM recipes_recipe r'
+    )
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(select)
+            return
+        for batch in _batches(recipe_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                batch
+            )
+            cursor.execute(f'{select} WHERE r.id IN ({placeholders})', batch)
+
+
+def update_search_index(recipe_ids=None):
+    """
+    Обновляет поисковый индекс рецептов, для всех при recipe_ids=None.
+    """
+    if connection.vendor == 'postgresql':
+        _update_postgresql(recipe_ids)
+    elif connection.vendor == 'sqlite':
+        _update_sqlite(recipe_ids)
+
+
+def remove_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [recipe_id])
+
+
+def _fts_query(value):
+    words = (word.replace('"', '""') for word in value.split())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, value):
+    if not value.strip():
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date')
+    if connection.vendor == 'sqlite':
+        fts_query = _fts_query(value)
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (fts_query,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -rank FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id',
+            (fts_query,), output_field=FloatField()
+        )).order_by('-search_rank', '-pub_date')
+    return queryset.filter(name__icontains=value)
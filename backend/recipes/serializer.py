@@ -1,32 +1,58 @@
 from base64 import b64decode
-from collections import OrderedDict
+from binascii import Error as BinasciiError
+from collections import defaultdict
+from uuid import uuid4
 
 from django.core.files.base import ContentFile
-from django.db.models import F
-from rest_framework.serializers import (CharField, ImageField, IntegerField,
-                                        ModelSerializer,
-                                        PrimaryKeyRelatedField,
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from rest_framework.serializers import (CharField, Field, ImageField,
+                                        IntegerField, ListField,
+                                        ListSerializer, ModelSerializer,
+                                        PrimaryKeyRelatedField, Serializer,
                                         SerializerMethodField, ValidationError)
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.constants import Limits, Messages
+from foodgram.instrumentation import serializer_timer
+from recipes import grocery, images
+from recipes.constants import BatchSettings, ImageSettings, Limits, Messages
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.relations import get_relations
+from recipes.search import update_search_index
 from users.serializer import UserSerializer
 
 
 class Base64ImageField(ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(b64decode(imgstr), name='temp.' + ext)
+            imgstr = data.split(';base64,')[-1]
+            if len(imgstr) * 3 // 4 > ImageSettings.MAX_UPLOAD_SIZE:
+                raise ValidationError(Messages.IMAGE_TOO_LARGE_ERROR.format(
+                    size=ImageSettings.MAX_UPLOAD_SIZE // (1024 * 1024)
+                ))
+            try:
+                content, ext = images.canonicalize(b64decode(imgstr))
+            except BinasciiError:
+                raise ValidationError(Messages.INVALID_IMAGE_ERROR)
+            except images.InvalidImage as error:
+                raise ValidationError(str(error))
+            data = ContentFile(content, name=f'{uuid4().hex}.{ext}')
         return super().to_internal_value(data)
 
     def to_representation(self, value):
         return self.context['request'].build_absolute_uri(value.url)
 
 
+class ImageVariantsField(Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return images.get_variant_urls(recipe, self.context['request'])
+
+
 class TagSerializer(ModelSerializer):
     class Meta:
         model = Tag
@@ -42,24 +68,52 @@ class IngredientSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class IngredientPrimaryKeyField(PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        preloaded = getattr(self.parent, 'preloaded_ingredients', None)
+        if preloaded:
+            try:
+                return preloaded[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class RecipeIngredientListSerializer(ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = {str(item.get('id')) for item in data
+                   if isinstance(item, dict)}
+            self.child.preloaded_ingredients = Ingredient.objects.in_bulk(
+                [int(pk) for pk in ids if pk.isdigit()]
+            )
+        return super().to_internal_value(data)
+
+
 class RecipeIngredientSerializer(ModelSerializer):
-    id = PrimaryKeyRelatedField(
+    id = IngredientPrimaryKeyField(
         source='ingredient',
-        queryset=Ingredient.objects.all(),
-        write_only=True
+        queryset=Ingredient.objects.all()
     )
+    name = CharField(source='ingredient.name', read_only=True)
+    measurement_unit = CharField(source='ingredient.measurement_unit',
+                                 read_only=True)
     amount = IntegerField(min_value=Limits.MIN_STANDARD_VALUE,
-                          max_value=Limits.MAX_AMOUNT, write_only=True)
+                          max_value=Limits.MAX_AMOUNT)
 
     class Meta:
         model = RecipeIngredient
-        fields = ('id', 'amount')
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = RecipeIngredientListSerializer
 
 
 class RecipeSerializer(ModelSerializer):
-    ingredients = RecipeIngredientSerializer(many=True, allow_empty=False)
+    ingredients = RecipeIngredientSerializer(
+        source='recipe_ingredients', many=True, allow_empty=False
+    )
     author = UserSerializer(read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='*')
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
     cooking_time = IntegerField(min_value=Limits.MIN_STANDARD_VALUE,
@@ -68,19 +122,19 @@ class RecipeSerializer(ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'id', 'name', 'text', 'image', 'cooking_time', 'tags',
+            'id', 'name', 'text', 'image', 'image_variants', 'cooking_time',
+            'tags',
             'ingredients', 'author', 'is_favorited', 'is_in_shopping_cart'
         )
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        return (user.is_authenticated
-                and obj.favorites.filter(user=user).exists())
+        return obj.id in self.get_relations().favorites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        return (user.is_authenticated
-                and obj.shopping_cart.filter(user=user).exists())
+        return obj.id in self.get_relations().shopping_cart
+
+    def get_relations(self):
+        return get_relations(self.context['request'].user)
 
     def validate_tags(self, data):
         tags = self.initial_data['tags']
@@ -99,40 +153,161 @@ class RecipeSerializer(ModelSerializer):
             )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
+        ingredients_data = validated_data.pop('recipe_ingredients')
         tags_data = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
-        for ingredient_data in ingredients_data:
-            RecipeIngredient.objects.create(recipe=recipe, **ingredient_data)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, **ingredient_data)
+            for ingredient_data in ingredients_data
+        )
+        update_search_index([recipe.id])
+        images.schedule_variants(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if not validated_data.get('tags'):
             raise ValidationError({'tags': [Messages.REQUIRED_FIELD_ERROR]})
-        if not validated_data.get('ingredients'):
+        if not validated_data.get('recipe_ingredients'):
             raise ValidationError(
                 {'ingredients': [Messages.REQUIRED_FIELD_ERROR]}
             )
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        for ingredient in validated_data.pop('ingredients'):
-            RecipeIngredient.objects.create(recipe=instance, **ingredient)
+        old_amounts, new_amounts = self._update_ingredients(
+            instance, validated_data.pop('recipe_ingredients')
+        )
+        grocery.change_recipe(instance.id, old_amounts, new_amounts)
+        if 'image' in validated_data:
+            validated_data['has_image_variants'] = False
+        instance = super().update(instance, validated_data)
+        update_search_index([instance.id])
+        if 'image' in validated_data:
+            images.schedule_variants(instance)
+        return instance
 
-        return super().update(instance, validated_data)
+    @staticmethod
+    def _update_ingredients(instance, ingredients_data):
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=instance)
+        }
+        old_amounts = {ingredient_id: item.amount
+                       for ingredient_id, item in current.items()}
+        new_amounts = {item['ingredient'].id: item['amount']
+                       for item in ingredients_data}
+        to_update, to_create = [], []
+        for ingredient_id, amount in new_amounts.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                to_create.append(RecipeIngredient(
+                    recipe=instance, ingredient_id=ingredient_id,
+                    amount=amount
+                ))
+            elif item.amount != amount:
+                item.amount = amount
+                to_update.append(item)
+        to_delete = [item.id for ingredient_id, item in current.items()
+                     if ingredient_id not in new_amounts]
+        if to_delete:
+            RecipeIngredient.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        return old_amounts, new_amounts
 
     def to_representation(self, instance):
-        tags = instance.tags.values()
-        ingredients = instance.ingredients.values(
-            'id', 'name', 'measurement_unit',
-            amount=F('recipe_ingredients__amount')
-        )
-        instance = super().to_representation(instance)
-        instance['tags'] = [OrderedDict(tag) for tag in tags]
-        instance['ingredients'] = [
-            OrderedDict(ingredient) for ingredient in ingredients
-        ]
-        return instance
+        prefetch_related_objects([instance], *Recipe.objects.prefetches())
+        data = super().to_representation(instance)
+        data['tags'] = TagSerializer(instance.tags.all(), many=True).data
+        return data
+
+
+class RecipeReadSerializer:
+    """
+    Представление рецептов для чтения без полей DRF.
+
+    Принимает строки Recipe.objects.values(*FIELDS), теги и ингредиенты
+    страницы загружает двумя запросами values_list и собирает обычные
+    словари, а ссылки на изображения строит от префикса MediaUrls.
+    Результат совпадает с RecipeSerializer байт в байт.
+    """
+    FIELDS = (
+        'id', 'name', 'text', 'image', 'has_image_variants',
+        'cooking_time', 'pub_date', 'author_id', 'author__username',
+        'author__first_name', 'author__last_name', 'author__email'
+    )
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        with serializer_timer():
+            rows = list(self.instance) if self.many else [self.instance]
+            recipes = self.to_representation(rows)
+        return recipes if self.many else recipes[0]
+
+    @staticmethod
+    def get_tags(recipe_ids):
+        tags, by_recipe = {}, defaultdict(list)
+        for recipe_id, *tag in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag__name').values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        ):
+            if tag[0] not in tags:
+                tags[tag[0]] = dict(zip(('id', 'name', 'color', 'slug'), tag))
+            by_recipe[recipe_id].append(tags[tag[0]])
+        return by_recipe
+
+    @staticmethod
+    def get_ingredients(recipe_ids):
+        by_recipe = defaultdict(list)
+        for recipe_id, *ingredient in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('ingredient__name').values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            by_recipe[recipe_id].append(dict(zip(
+                ('id', 'name', 'measurement_unit', 'amount'), ingredient
+            )))
+        return by_recipe
+
+    def to_representation(self, rows):
+        request = self.context['request']
+        media = images.MediaUrls(request)
+        relations = get_relations(request.user)
+        recipe_ids = [row['id'] for row in rows]
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        return [{
+            'id': row['id'],
+            'name': row['name'],
+            'text': row['text'],
+            'image': media.get(row['image']) if row['image'] else None,
+            'image_variants': media.get_variants(
+                row['image'], row['has_image_variants']
+            ),
+            'cooking_time': row['cooking_time'],
+            'tags': tags[row['id']],
+            'ingredients': ingredients[row['id']],
+            'author': {
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'email': row['author__email'],
+                'is_subscribed': row['author_id'] in relations.subscriptions,
+            },
+            'is_favorited': row['id'] in relations.favorites,
+            'is_in_shopping_cart': row['id'] in relations.shopping_cart,
+        } for row in rows]
 
 
 class FavoriteSerializer(ModelSerializer):
@@ -140,11 +315,13 @@ class FavoriteSerializer(ModelSerializer):
     name = CharField(source='recipe.name', read_only=True)
     cooking_time = IntegerField(source='recipe.cooking_time', read_only=True)
     image = Base64ImageField(source='recipe.image', read_only=True)
+    image_variants = ImageVariantsField(source='recipe')
 
     class Meta:
         model = Favorite
         fields = (
-            'recipe', 'user', 'id', 'name', 'cooking_time', 'image')
+            'recipe', 'user', 'id', 'name', 'cooking_time', 'image',
+            'image_variants')
         extra_kwargs = {'user': {'write_only': True},
                         'recipe': {'write_only': True}}
         validators = [
@@ -166,3 +343,8 @@ class ShoppingCartSerializer(FavoriteSerializer):
                 message=Messages.ALREADY_EXISTING_ERROR,
             ),
         ]
+
+
+class RecipeBatchSerializer(Serializer):
+    recipes = ListField(child=IntegerField(min_value=1), allow_empty=False,
+                        max_length=BatchSettings.MAX_SIZE)
@@ -0,0 +1,176 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from foodgram.metrics import EVENTS
+from recipes import grocery
+from recipes.cache import (POPULARITY_GENERATION, RECIPE_GENERATION,
+                           RECIPES_GENERATION, SEARCH_GENERATION,
+                           USER_GENERATION, ingredient_catalog,
+                           invalidate_generations, invalidate_recipes,
+                           tag_catalog)
+from recipes.counters import COUNTERS
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.relations import UserRelations
+from recipes.search import remove_from_search_index, update_search_index
+from users.models import Subscription, User
+
+AUTHOR_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_index(sender, instance, created, **kwargs):
+    ingredient_index.update(instance)
+    ingredient_catalog.bump_version()
+    if not created:
+        update_search_index(Recipe.objects.filter(
+            ingredients=instance
+        ).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Ingredient)
+def remove_from_ingredient_index(sender, instance, **kwargs):
+    ingredient_index.remove(instance.pk)
+    ingredient_catalog.bump_version()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tag_catalog_version(sender, **kwargs):
+    tag_catalog.bump_version()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_grocery_list(sender, instance, created, **kwargs):
+    if created:
+        grocery.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_grocery_list(sender, instance, **kwargs):
+    grocery.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def invalidate_user_relations(sender, instance, **kwargs):
+    UserRelations.invalidate(instance.user_id)
+
+
+for counter in COUNTERS:
+    post_save.connect(counter.on_related_saved, sender=counter.related_model,
+                      dispatch_uid=f'{counter}_saved')
+    post_delete.connect(counter.on_related_deleted,
+                        sender=counter.related_model,
+                        dispatch_uid=f'{counter}_deleted')
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_search_index(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_responses(sender, instance, created, **kwargs):
+    invalidate_generations(
+        RECIPES_GENERATION if created else SEARCH_GENERATION,
+        RECIPE_GENERATION.format(pk=instance.pk)
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_deleted_recipe_responses(sender, instance, **kwargs):
+    invalidate_generations(RECIPES_GENERATION,
+                           RECIPE_GENERATION.format(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_responses(sender, instance, action, reverse,
+                                     pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    recipe_ids = (pk_set or ()) if reverse else [instance.pk]
+    invalidate_generations(RECIPES_GENERATION, *(
+        RECIPE_GENERATION.format(pk=pk) for pk in recipe_ids
+    ))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, **kwargs):
+    invalidate_generations(USER_GENERATION.format(pk=instance.pk))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_popularity_responses(sender, **kwargs):
+    invalidate_generations(POPULARITY_GENERATION)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipes_on_tags_change(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            Recipe.objects.filter(pk=instance.pk).touch()
+    elif action == 'pre_clear':
+        Recipe.objects.filter(tags=instance).touch()
+    elif action in ('post_add', 'post_remove'):
+        Recipe.objects.filter(pk__in=pk_set).touch()
+
+
+@receiver(post_save, sender=Tag)
+def touch_recipes_on_tag_change(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(pre_delete, sender=Tag)
+def touch_recipes_on_tag_delete(sender, instance, **kwargs):
+    Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_ingredient_change(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(ingredients=instance).touch()
+
+
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_on_ingredient_delete(sender, instance, **kwargs):
+    recipes = Recipe.objects.filter(ingredients=instance)
+    invalidate_recipes(recipes.values_list('id', flat=True))
+    recipes.touch()
+
+
+@receiver(post_save, sender=User)
+def touch_recipes_on_author_change(sender, instance, created, update_fields,
+                                   **kwargs):
+    if created or (update_fields is not None
+                   and not AUTHOR_FIELDS.intersection(update_fields)):
+        return
+    Recipe.objects.filter(author=instance).touch()
+
+
+EVENT_NAMES = {
+    Recipe: 'recipe_created',
+    Favorite: 'favorite_added',
+    ShoppingCart: 'shopping_cart_added',
+    Subscription: 'subscription_created',
+}
+
+
+def count_event(sender, created, **kwargs):
+    if created:
+        EVENTS.labels(EVENT_NAMES[sender]).inc()
+
+
+for model in EVENT_NAMES:
+    post_save.connect(count_event, sender=model,
+                      dispatch_uid=f'{model.__name__}_event')
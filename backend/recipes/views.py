@@ -1,58 +1,165 @@
-import io
+from hashlib import sha1
 
-from django.db.models import F, Sum
+from django.db import transaction
+from django.db.models import F, Max
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from rest_framework import status, views, viewsets
+from rest_framework import generics, status, views, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
-from recipes.constants import Messages, PdfSettings
-from recipes.filters import IngredientFilter, RecipeFilter
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+from recipes import batch
+from recipes.cache import (POPULARITY_GENERATION, RECIPE_GENERATION,
+                           RECIPES_GENERATION, SEARCH_GENERATION,
+                           USER_GENERATION, CatalogCacheMixin,
+                           ConditionalGetMixin, ResponseCacheMixin,
+                           get_generation_key, get_generations,
+                           ingredient_catalog, recipe_responses, tag_catalog)
+from recipes.constants import ExportSettings, Messages, PdfSettings
+from recipes.export import EXPORTERS, get_export_response
+from recipes.filters import RecipeFilter
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, GroceryItem, Ingredient, Recipe,
                             ShoppingCart, Tag)
+from recipes.pagination import RecipeCursorPagination, RecipePagination
+from recipes.pdf import get_grocery_list_pdf
 from recipes.permissions import IsAuthorOrReadOnly
+from recipes.relations import get_relations
 from recipes.serializer import (FavoriteSerializer, IngredientSerializer,
+                                RecipeBatchSerializer, RecipeReadSerializer,
                                 RecipeSerializer, ShoppingCartSerializer,
                                 TagSerializer)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+    catalog = ingredient_catalog
+
+    def get_list_response(self, request, version, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().get_list_response(
+                request, version, *args, **kwargs
+            )
+        return Response(ingredient_index.search(name))
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    catalog = tag_catalog
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, ResponseCacheMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = RecipePagination
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    response_cache = recipe_responses
+    popularity_fields = ('favorites_count', 'in_carts_count')
+
+    read_actions = ('list', 'retrieve', 'feed')
+
+    def is_read(self):
+        return (self.action in self.read_actions
+                and self.request.method in ('GET', 'HEAD'))
+
+    def get_queryset(self):
+        if self.is_read():
+            return Recipe.objects.values(*RecipeReadSerializer.FIELDS)
+        return Recipe.objects.with_related()
+
+    def get_serializer_class(self):
+        if self.is_read():
+            return RecipeReadSerializer
+        return super().get_serializer_class()
+
+    def get_dependencies(self, request):
+        keys = [tag_catalog.version_key, ingredient_catalog.version_key]
+        if self.action != 'list':
+            return keys
+        names = [RECIPES_GENERATION]
+        if 'search' in request.query_params:
+            names.append(SEARCH_GENERATION)
+        ordering = ','.join(request.query_params.getlist('ordering'))
+        if any(field.strip().lstrip('-') in self.popularity_fields
+               for field in ordering.split(',')):
+            names.append(POPULARITY_GENERATION)
+        return keys + [get_generation_key(name) for name in names]
+
+    def get_data_dependencies(self, data):
+        recipes = data if isinstance(data, list) else data.get(
+            'results', [data]
+        )
+        names = set()
+        for recipe in recipes:
+            names.add(RECIPE_GENERATION.format(pk=recipe['id']))
+            names.add(USER_GENERATION.format(pk=recipe['author']['id']))
+        return [get_generation_key(name) for name in sorted(names)]
+
+    def get_list_validators(self, request):
+        updated_at = Recipe.objects.aggregate(
+            updated_at=Max('updated_at')
+        )['updated_at']
+        generations = get_generations(self.get_dependencies(request))
+        parts = (
+            request.accepted_renderer.format,
+            updated_at and updated_at.isoformat(),
+            *(generations.get(key) for key in sorted(generations)),
+            get_relations(request.user).get_digest(),
+        )
+        digest = sha1('|'.join(map(str, parts)).encode()).hexdigest()
+        return quote_etag(f'recipes-{digest}'), None
+
+    def get_object_validators(self, request, pk=None):
+        recipe_id, updated_at, author_id = generics.get_object_or_404(
+            Recipe.objects.values_list('id', 'updated_at', 'author_id'),
+            pk=pk
+        )
+        relations = get_relations(request.user)
+        flags = ''.join(str(int(flag)) for flag in (
+            recipe_id in relations.favorites,
+            recipe_id in relations.shopping_cart,
+            author_id in relations.subscriptions,
+        ))
+        etag = quote_etag(
+            f'recipe-{recipe_id}-{updated_at.timestamp():.6f}-{flags}-'
+            f'{request.accepted_renderer.format}'
+        )
+        last_modified = None
+        if request.user.is_anonymous:
+            last_modified = int(updated_at.timestamp())
+        return etag, last_modified
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=['GET'],
+            pagination_class=RecipeCursorPagination,
+            permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        queryset = self.filter_queryset(
+            self.get_queryset().followed_by(request.user)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['POST'], queryset=Favorite.objects.all(),
             serializer_class=FavoriteSerializer,
             permission_classes=(IsAuthenticated,))
@@ -73,6 +180,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_shopping_cart(self, request, pk=None):
         return self._delete_record(request, pk)
 
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='favorite/batch', url_name='favorite-batch',
+            serializer_class=RecipeBatchSerializer,
+            permission_classes=(IsAuthenticated,))
+    def favorite_batch(self, request):
+        return self._apply_batch(request, batch.favorites)
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='shopping_cart/batch', url_name='shopping-cart-batch',
+            serializer_class=RecipeBatchSerializer,
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_batch(self, request):
+        return self._apply_batch(request, batch.shopping_cart)
+
+    def _apply_batch(self, request, relation):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            return Response(relation.add(request.user, recipes))
+        return Response(relation.remove(request.user, recipes))
+
+    @transaction.atomic
     def _create_record(self, request, pk):
         request.data['user'] = request.user.id
         request.data['recipe'] = pk
@@ -84,6 +214,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED,
                         headers=headers)
 
+    @transaction.atomic
     def _delete_record(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         instance = self.queryset.filter(user=request.user, recipe=recipe)
@@ -96,59 +227,30 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
 class DownloadCartView(views.APIView):
 
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
     def get(self, request, *args, **kwargs):
-        buffer = io.BytesIO()
-        response = self._set_settings(
-            filename=PdfSettings.FILE_NAME,
-            font=PdfSettings.FONT,
-            font_path=PdfSettings.FONT_PATH
-        )
         grocery_list = self._get_grocery_list(user_id=self.request.user.id)
-
-        page = canvas.Canvas(response)
-        self._fill_page(
-            grocery_list=grocery_list, page=page, settings=PdfSettings
+        export_format = request.query_params.get(ExportSettings.FORMAT_PARAM)
+        if export_format in EXPORTERS:
+            return get_export_response(request, grocery_list, export_format)
+        response = HttpResponse(
+            get_grocery_list_pdf(list(grocery_list)),
+            content_type='application/pdf'
         )
-        page.showPage()
-        page.save()
-
-        buffer.seek(0)
+        content_disposition = f'attachment; filename="{PdfSettings.FILE_NAME}"'
+        response['Content-Disposition'] = content_disposition
         return response
 
-    @staticmethod
-    def _fill_page(grocery_list, page, settings):
-        page.setFont(settings.FONT, settings.TITLE_FONT_SIZE)
-        page.drawString(*settings.TITLE_X_Y, text=settings.TITLE_TEXT)
-        page.setFont(settings.FONT, settings.TEXT_FONT_SIZE)
-        row_y = settings.ROW_START_Y
-
-        for i, item in enumerate(grocery_list, start=1):
-            row_y -= settings.ROW_SHIFT_Y
-            name = item['name'].capitalize()
-            amount = item['amount_sum']
-            unit = item['measurement_unit']
-
-            page.drawString(settings.INGREDIENT_X, row_y, f'{i}. {name}')
-            page.drawString(settings.AMOUNT_X, row_y, f'{amount} {unit}')
-
     @staticmethod
     def _get_grocery_list(user_id):
-        ingredient_set = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=user_id
+        ingredient_set = GroceryItem.objects.filter(
+            user=user_id
         ).values(
             name=F('ingredient__name'),
-            measurement_unit=F('ingredient__measurement_unit')
-        ).annotate(
-            amount_sum=Sum('amount')
+            measurement_unit=F('ingredient__measurement_unit'),
+            amount_sum=F('amount')
         ).order_by('name')
 
         return ingredient_set
-
-    @staticmethod
-    def _set_settings(filename, font=None, font_path=None):
-        if font and font_path:
-            pdfmetrics.registerFont(TTFont(font, font_path))
-        response = HttpResponse(content_type='application/pdf')
-        content_disposition = f'attachment; filename="{filename}"'
-        response['Content-Disposition'] = content_disposition
-        return response
@@ -0,0 +1,55 @@
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.metrics import count_cache_lookup
+
+TOKEN_CACHE_ALIAS = 'tokens'
+TOKEN_CACHE_KEY = 'auth_token:{key}'
+
+
+def get_token_cache():
+    return caches[TOKEN_CACHE_ALIAS]
+
+
+def invalidate_tokens(keys):
+    get_token_cache().delete_many(
+        [TOKEN_CACHE_KEY.format(key=key) for key in keys]
+    )
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(Token.objects.filter(
+        user_id=user_id
+    ).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который берёт пользователя по токену из кэша
+    TOKEN_CACHE_ALIAS вместо запроса Token с join User.
+
+    Размер и время жизни записей задаются настройками этого кэша.
+    Запись удаляется сигналами при удалении токена (выход через djoser
+    token/logout) и при сохранении или удалении пользователя, в том
+    числе при деактивации. Запросы на запись всегда читают пользователя
+    из базы, чтобы не сохранить устаревшую копию поверх свежих данных.
+    """
+    cacheable = False
+
+    def authenticate(self, request):
+        self.cacheable = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not self.cacheable:
+            return super().authenticate_credentials(key)
+        cache = get_token_cache()
+        cache_key = TOKEN_CACHE_KEY.format(key=key)
+        credentials = cache.get(cache_key)
+        count_cache_lookup('auth_token', credentials is not None)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials)
+        return credentials
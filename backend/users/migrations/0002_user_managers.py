@@ -0,0 +1,16 @@
+# Generated by Django 3.2.3 on 2026-10-16 22:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Оставлена пустой: собственный менеджер пользователей удалён,
+    а 0001_initial уже записывает стандартный UserManager.
+    """
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = []
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-16 23:17
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_subscriptions(apps, schema_editor):
+    Subscription = apps.get_model('users', 'Subscription')
+    User = apps.get_model('users', 'User')
+    duplicates = list(Subscription.objects.values(
+        'user_id', 'subscription_id'
+    ).annotate(keep_id=Min('id'), rows=Count('id')).filter(
+        rows__gt=1
+    ).order_by())
+    for row in duplicates:
+        Subscription.objects.filter(
+            user_id=row['user_id'], subscription_id=row['subscription_id']
+        ).exclude(id=row['keep_id']).delete()
+    if duplicates:
+        User.objects.filter(
+            id__in={row['subscription_id'] for row in duplicates}
+        ).update(subscribers_count=Coalesce(Subquery(
+            Subscription.objects.filter(
+                subscription=OuterRef('pk')
+            ).order_by().values('subscription').annotate(
+                count=Count('pk')
+            ).values('count')
+        ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_subscriptions,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('user', 'subscription'), name='user_user_subscription'),
+        ),
+    ]
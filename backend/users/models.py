@@ -1,10 +1,11 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram.db import DerivedFieldsMixin
 from recipes.constants import Limits
 
 
-class User(AbstractUser):
+class User(DerivedFieldsMixin, AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
 
@@ -13,6 +14,18 @@ class User(AbstractUser):
                                   blank=False)
     last_name = models.CharField(max_length=Limits.MAX_USER_FIELDS_LENGTH,
                                  blank=False)
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков'
+    )
+
+    derived_fields = ('recipes_count', 'subscribers_count')
 
     class Meta:
         ordering = ('id',)
@@ -39,10 +52,12 @@ class Subscription(models.Model):
         ordering = ('user', 'subscription')
         verbose_name = 'подписка'
         verbose_name_plural = 'Подписки'
-        models.UniqueConstraint(
-            fields=['user', 'subscription'],
-            name='user_user_subscription'
-        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'subscription'],
+                name='user_user_subscription'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.subscription.username}'
@@ -3,10 +3,13 @@ from itertools import islice
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (IntegerField, ListField,
+                                        ModelSerializer, Serializer)
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.constants import Messages
+from recipes import images
+from recipes.constants import BatchSettings, Messages
+from recipes.relations import get_relations
 from users.models import Subscription, User
 
 
@@ -21,9 +24,8 @@ class UserSerializer(DjoserUserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return (user.is_authenticated
-                and obj.subscriptions.filter(user=user).exists())
+        relations = get_relations(self.context['request'].user)
+        return obj.id in relations.subscriptions
 
 
 class SubscribeSerializer(ModelSerializer):
@@ -43,23 +45,34 @@ class SubscribeSerializer(ModelSerializer):
             raise ValidationError(Messages.SUBSCRIBE_BY_YOURSELF_ERROR)
         return data
 
+    @staticmethod
+    def get_recipes_limit(request):
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        return int(recipes_limit) if recipes_limit.isdigit() else None
+
     def to_representation(self, instance):
         request = self.context['request']
-        if recipe_limit := request.query_params.get('recipes_limit'):
-            recipe_limit = int(recipe_limit)
-
-        recipes = instance.subscription.recipes
+        author = instance.subscription
+        recipes = getattr(author, 'limited_recipes', None)
+        if recipes is None:
+            recipes = islice(author.recipes.all(),
+                             self.get_recipes_limit(request))
         recipe_set = []
-        for recipe in islice(recipes.all(), recipe_limit):
+        for recipe in recipes:
             recipe_set.append({
                 'id': recipe.id,
                 'name': recipe.name,
                 'cooking_time': recipe.cooking_time,
-                'image': request.build_absolute_uri(recipe.image.url)
+                'image': request.build_absolute_uri(recipe.image.url),
+                'image_variants': images.get_variant_urls(recipe, request)
             })
 
-        subscription = UserSerializer(instance.subscription,
-                                      context=self.context).data
+        subscription = UserSerializer(author, context=self.context).data
         subscription['recipes'] = recipe_set
-        subscription['recipes_count'] = recipes.count()
+        subscription['recipes_count'] = author.recipes_count
         return subscription
+
+
+class SubscribeBatchSerializer(Serializer):
+    authors = ListField(child=IntegerField(min_value=1), allow_empty=False,
+                        max_length=BatchSettings.MAX_SIZE)
@@ -1,17 +1,24 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import generics, status
+from rest_framework import generics, status, views
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from recipes import batch
 from recipes.constants import Messages
+from recipes.models import Recipe
+from recipes.pagination import LimitOffsetOrCursorPagination
 from users.models import Subscription, User
-from users.serializer import SubscribeSerializer
+from users.serializer import SubscribeBatchSerializer, SubscribeSerializer
 
 
 class UserView(UserViewSet):
+    pagination_class = LimitOffsetOrCursorPagination
+
     def get_permissions(self):
         if self.action == "me" and self.request.user.is_anonymous:
             return (IsAuthenticated(),)
@@ -19,12 +26,30 @@ class UserView(UserViewSet):
 
 
 class SubscriptionListView(generics.ListAPIView):
-    queryset = Subscription.objects.all()
     serializer_class = SubscribeSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetOrCursorPagination
     permission_classes = (IsAuthenticated,)
     filter_backends = (DjangoFilterBackend,)
 
+    def get_queryset(self):
+        user = self.request.user
+        return Subscription.objects.filter(user=user).select_related(
+            'subscription'
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        subscriptions = list(queryset) if page is None else page
+        authors = [subscription.subscription for subscription in subscriptions]
+        recipes = Recipe.objects.filter(author__in=authors)
+        recipes_limit = SubscribeSerializer.get_recipes_limit(self.request)
+        if recipes_limit is not None:
+            recipes = recipes.limited_per_author(recipes_limit)
+        prefetch_related_objects(authors, Prefetch(
+            'recipes', queryset=recipes, to_attr='limited_recipes'
+        ))
+        return page
+
 
 class SubscribeView(generics.CreateAPIView, generics.DestroyAPIView):
     queryset = Subscription.objects.all()
@@ -33,12 +58,14 @@ class SubscribeView(generics.CreateAPIView, generics.DestroyAPIView):
     filter_backends = (DjangoFilterBackend,)
     permission_classes = (IsAuthenticated,)
 
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         request.data['user'] = self.request.user.id
         request.data['subscription'] = get_object_or_404(
             User, id=self.kwargs.get('pk')).id
         return super().create(request, *args, **kwargs)
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         subscription = get_object_or_404(User, id=self.kwargs.get('pk')).id
         instance = self.queryset.filter(user=request.user.id,
@@ -48,3 +75,23 @@ class SubscribeView(generics.CreateAPIView, generics.DestroyAPIView):
                             status=status.HTTP_400_BAD_REQUEST)
         self.perform_destroy(instance.first())
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SubscribeBatchView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        return Response(batch.subscriptions.add(
+            request.user, self.get_authors(request)
+        ))
+
+    def delete(self, request):
+        return Response(batch.subscriptions.remove(
+            request.user, self.get_authors(request)
+        ))
+
+    @staticmethod
+    def get_authors(request):
+        serializer = SubscribeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['authors']